@@ -1,3 +1,4 @@
+import time
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -8,6 +9,7 @@ from app.models.schemas.video import User
 from app.cruds.user import user_crud
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -18,6 +20,8 @@ async def get_current_user(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
         email: str = payload.get("sub")
+        user_id: Optional[str] = payload.get("uid")
+        expires_at = payload.get("exp")
         if email is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -29,7 +33,10 @@ async def get_current_user(
             detail="Could not validate credentials",
         )
     
-    user = await user_crud.get_by_email(email)
+    ttl = settings.PRINCIPAL_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, int(expires_at - time.time()))
+    user = await user_crud.get_principal(email, user_id=user_id, ttl=ttl)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -41,3 +48,12 @@ async def get_current_active_user(
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[User]:
+    """The signed-in active user, or None for anonymous requests. Invalid tokens are still rejected."""
+    if credentials is None:
+        return None
+    user = await get_current_user(credentials)
+    return None if user.disabled else user
@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Optional
+from fastapi import Depends
+from strawberry.dataloader import DataLoader
+from app.api import deps
+from app.cruds.user import user_crud
+from app.cruds.video import video_crud
+from app.models.schemas.video import User
+
+
+async def load_videos(video_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    # One get_many per tick: the catalog replica, one cache MGET, then chunked get_all for the rest
+    found = {video["id"]: video for video in await video_crud.get_many(list(video_ids))}
+    return [found.get(video_id) for video_id in video_ids]
+
+
+def favorite_flags_loader(user_id: str) -> DataLoader:
+    async def load(video_ids: List[str]) -> List[bool]:
+        favorites = await user_crud.contains_favorites(user_id, list(video_ids))
+        return [favorites.get(video_id, False) for video_id in video_ids]
+
+    return DataLoader(load_fn=load)
+
+
+async def get_context(user: Optional[User] = Depends(deps.get_optional_user)) -> Dict[str, Any]:
+    """
+    Per-request state. Loaders are created fresh for every request, so
+    everything fetched is shared between resolvers of one query (however
+    often a video appears in it) but never leaks into another request. The
+    signed-in user is resolved once here by the usual auth dependency.
+    """
+    return {
+        "user": user,
+        "videos": DataLoader(load_fn=load_videos),
+        "favorite_flags": favorite_flags_loader(user.id) if user else None,
+    }
@@ -0,0 +1,73 @@
+from typing import Dict, Optional, Set, Tuple
+from graphql import GraphQLError, ValidationRule
+from graphql.language import (
+    FieldNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    IntValueNode,
+    ListValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+)
+
+# List fields -> (argument bounding their size, size assumed when it isn't a literal)
+LIST_FIELDS: Dict[str, Tuple[str, int]] = {
+    "feed": ("limit", 100),
+    "trending": ("limit", 100),
+    "videos": ("ids", 100),
+    "similar": ("limit", 50),
+    "history": ("limit", 100),
+    "favorites": ("limit", 100),
+}
+
+
+def _multiplier(field: FieldNode) -> int:
+    bound = LIST_FIELDS.get(field.name.value)
+    if bound is None:
+        return 1
+    name, worst_case = bound
+    for argument in field.arguments or ():
+        if argument.name.value != name:
+            continue
+        if isinstance(argument.value, IntValueNode):
+            return max(1, min(int(argument.value.value), worst_case))
+        if isinstance(argument.value, ListValueNode):
+            return max(1, min(len(argument.value.values), worst_case))
+    # Variables aren't known during validation, and defaults are small but not free
+    return worst_case
+
+
+class QueryCostLimit(ValidationRule):
+    """
+    Rejects operations whose estimated cost is above `max_cost` before
+    anything is resolved. Each field costs 1, and everything selected under
+    a list field is multiplied by the number of items it can return, so
+    `feed(limit: 50) { similar(limit: 20) { title } }` costs about 50 * 20.
+    """
+    max_cost = 2000
+
+    def enter_operation_definition(self, node: OperationDefinitionNode, *_args):
+        cost = self._cost(node.selection_set, set())
+        if cost > self.max_cost:
+            self.report_error(GraphQLError(f"Query cost {cost} exceeds the limit of {self.max_cost}", node))
+
+    def _cost(self, selection_set: Optional[SelectionSetNode], fragments: Set[str]) -> int:
+        if selection_set is None:
+            return 0
+        total = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                total += 1 + _multiplier(selection) * self._cost(selection.selection_set, fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                total += self._cost(selection.selection_set, fragments)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                # Cycles are reported by the standard NoFragmentCycles rule; just don't follow them
+                if fragment is not None and name not in fragments:
+                    total += self._cost(fragment.selection_set, fragments | {name})
+        return total
+
+
+def query_cost_limit(max_cost: int) -> type:
+    return type("QueryCostLimit", (QueryCostLimit,), {"max_cost": max_cost})
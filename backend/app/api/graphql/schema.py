@@ -0,0 +1,207 @@
+from enum import Enum
+from typing import Any, Dict, List, Optional
+import strawberry
+from strawberry.extensions import AddValidationRules, MaxAliasesLimiter, QueryDepthLimiter
+from strawberry.types import Info
+from app.api.graphql.limits import query_cost_limit
+from app.api.v1.endpoints.videos import (
+    FEED_CACHE_TTL,
+    FEED_STALE_TTL,
+    FEED_VIEWS_CACHE_TTL,
+    MAX_BATCH_IDS,
+    MAX_FEED_LIMIT,
+    TRENDING_CACHE_TTL,
+    TRENDING_STALE_TTL,
+)
+from app.core.config import settings
+from app.cruds.user import user_crud
+from app.cruds.video import catalog_cache_key, catalog_ttl, decode_cursor, video_crud
+from app.db.cache import cache_get_or_load
+from app.services.playback import playback_tracker
+from app.services.recommendations import recommendation_index
+from app.services.trending import trending_videos
+
+MAX_PAGE = 100
+MAX_SIMILAR = 50
+
+
+def _check_limit(limit: int, maximum: int):
+    if not 1 <= limit <= maximum:
+        raise ValueError(f"limit must be between 1 and {maximum}")
+
+
+@strawberry.enum
+class FeedOrder(Enum):
+    ID = "id"
+    RELEASED_AT = "releasedAt"
+    VIEWS = "views"
+
+
+@strawberry.type
+class Video:
+    id: strawberry.ID
+    title: str
+    description: str
+    thumbnail_url: str
+    video_url: str
+    category: str
+    duration: str
+    trending: bool
+    views: int
+    released_at: Optional[str]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Video":
+        released_at = data.get("releasedAt")
+        return cls(
+            id=strawberry.ID(data["id"]),
+            title=data.get("title", ""),
+            description=data.get("description", ""),
+            thumbnail_url=data.get("thumbnailUrl", ""),
+            video_url=data.get("videoUrl", ""),
+            category=data.get("category", ""),
+            duration=str(data.get("duration", "")),
+            trending=bool(data.get("trending", False)),
+            views=int(data.get("views") or 0),
+            released_at=str(released_at) if released_at is not None else None,
+        )
+
+    @strawberry.field(description="Whether the signed-in user has favorited this video; null when anonymous")
+    async def is_favorite(self, info: Info) -> Optional[bool]:
+        loader = info.context["favorite_flags"]
+        return await loader.load(str(self.id)) if loader else None
+
+    @strawberry.field(description="Videos most often watched or favorited by the same people")
+    async def similar(self, info: Info, limit: int = 10) -> List["Video"]:
+        _check_limit(limit, MAX_SIMILAR)
+        return await _load_videos(info, recommendation_index.similar(str(self.id), limit))
+
+
+@strawberry.type
+class VideoPage:
+    items: List[Video]
+    next_cursor: Optional[str]
+
+
+@strawberry.type
+class HistoryEntry:
+    video_id: strawberry.ID
+    watched_at: Optional[str]
+    position_seconds: Optional[float]
+    duration_seconds: Optional[float]
+
+    @strawberry.field
+    async def video(self, info: Info) -> Optional[Video]:
+        data = await info.context["videos"].load(str(self.video_id))
+        return Video.from_dict(data) if data else None
+
+
+@strawberry.type
+class User:
+    id: strawberry.ID
+    email: str
+    display_name: Optional[str]
+
+    @strawberry.field(description="Recently watched videos with playback positions, newest first")
+    async def history(self, limit: int = 20) -> List[HistoryEntry]:
+        _check_limit(limit, MAX_PAGE)
+        entries = await playback_tracker.entries(str(self.id), limit)
+        return [
+            HistoryEntry(
+                video_id=strawberry.ID(entry["videoId"]),
+                watched_at=str(entry["watchedAt"]) if entry.get("watchedAt") is not None else None,
+                position_seconds=entry.get("positionSeconds"),
+                duration_seconds=entry.get("durationSeconds"),
+            )
+            for entry in entries
+            if entry.get("videoId")
+        ]
+
+    @strawberry.field(description="Favorite videos, newest first")
+    async def favorites(self, info: Info, limit: int = 20, cursor: Optional[str] = None) -> VideoPage:
+        _check_limit(limit, MAX_PAGE)
+        videos, next_cursor = await user_crud.get_favorites(str(self.id), limit, cursor)
+        _prime(info, videos)
+        return VideoPage(items=[Video.from_dict(video) for video in videos], next_cursor=next_cursor)
+
+
+def _prime(info: Info, videos: List[Dict[str, Any]]):
+    """Let later video(id) lookups in the same query reuse videos a list already fetched."""
+    info.context["videos"].prime_many({video["id"]: video for video in videos})
+
+
+async def _load_videos(info: Info, video_ids: List[str]) -> List[Video]:
+    found = await info.context["videos"].load_many(video_ids)
+    return [Video.from_dict(video) for video in found if video]
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    async def video(self, info: Info, id: strawberry.ID) -> Optional[Video]:
+        data = await info.context["videos"].load(str(id))
+        return Video.from_dict(data) if data else None
+
+    @strawberry.field(description="Several videos by id, in the order given; unknown ids are skipped")
+    async def videos(self, info: Info, ids: List[strawberry.ID]) -> List[Video]:
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError(f"At most {MAX_BATCH_IDS} ids per query")
+        return await _load_videos(info, [str(video_id) for video_id in dict.fromkeys(ids)])
+
+    @strawberry.field(description="One page of the feed; pass nextCursor back as cursor for the next one")
+    async def feed(
+        self,
+        info: Info,
+        category: Optional[str] = None,
+        order_by: FeedOrder = FeedOrder.ID,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> VideoPage:
+        _check_limit(limit, MAX_FEED_LIMIT)
+        order = order_by.value
+        if cursor:
+            decode_cursor(order, cursor)
+
+        async def load_page():
+            videos, next_cursor = await video_crud.get_page(category, limit, order, cursor)
+            return {"videos": videos, "next_cursor": next_cursor}
+
+        page = await cache_get_or_load(
+            await catalog_cache_key(f"graphql:feed:{category or 'all'}:{order}:{limit}:{cursor or 'first'}", category),
+            load_page,
+            ttl=catalog_ttl(FEED_VIEWS_CACHE_TTL if order == "views" else FEED_CACHE_TTL),
+            stale_ttl=FEED_STALE_TTL,
+            lock=settings.CACHE_DISTRIBUTED_LOCK,
+        )
+        _prime(info, page["videos"])
+        return VideoPage(items=[Video.from_dict(video) for video in page["videos"]], next_cursor=page["next_cursor"])
+
+    @strawberry.field
+    async def trending(self, info: Info, limit: int = 10, category: Optional[str] = None) -> List[Video]:
+        _check_limit(limit, MAX_PAGE)
+        videos = await cache_get_or_load(
+            await catalog_cache_key(f"graphql:trending:{category or 'all'}:{limit}", category),
+            lambda: trending_videos(limit, category),
+            ttl=catalog_ttl(TRENDING_CACHE_TTL),
+            stale_ttl=TRENDING_STALE_TTL,
+            lock=settings.CACHE_DISTRIBUTED_LOCK,
+        ) or []
+        _prime(info, videos)
+        return [Video.from_dict(video) for video in videos]
+
+    @strawberry.field(description="The signed-in user; null for anonymous requests")
+    def me(self, info: Info) -> Optional[User]:
+        user = info.context["user"]
+        if user is None:
+            return None
+        return User(id=strawberry.ID(user.id), email=user.email, display_name=user.display_name)
+
+
+schema = strawberry.Schema(
+    query=Query,
+    extensions=[
+        QueryDepthLimiter(max_depth=settings.GRAPHQL_MAX_DEPTH),
+        MaxAliasesLimiter(max_alias_count=settings.GRAPHQL_MAX_ALIASES),
+        AddValidationRules([query_cost_limit(settings.GRAPHQL_MAX_COST)]),
+    ],
+)
@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import parse_qsl
+import orjson
+from app.core import metrics
+from app.core.config import settings
+from app.core.imports import lazy_import
+from app.db.cache import cache_only
+
+# Loaded on the first profiled request
+pyinstrument = lazy_import("pyinstrument")
+
+logger = logging.getLogger(__name__)
+
+http_requests = metrics.Counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+http_duration = metrics.Histogram("http_request_duration_seconds", "HTTP request latency until the response is complete", ["method", "route"])
+http_in_progress = metrics.Gauge("http_requests_in_progress", "HTTP requests currently being handled", ["method"])
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """The matched route template (e.g. /api/v1/videos/{video_id}), so ids don't explode label cardinality."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request per route template. A request carrying
+    `X-Profile: <PROFILING_TOKEN>` is also run under pyinstrument and the
+    report written to PROFILING_OUTPUT_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = self._profiler(scope)
+        http_in_progress.inc(method=method)
+        started = time.perf_counter()
+        try:
+            if profiler:
+                profiler.start()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_progress.dec(method=method)
+            route = route_label(scope)
+            http_duration.observe(elapsed, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status)
+            if profiler:
+                profiler.stop()
+                self._save_profile(profiler, method, route, elapsed)
+
+    @staticmethod
+    def _profiler(scope) -> Optional["pyinstrument.Profiler"]:
+        if not settings.PROFILING_TOKEN:
+            return None
+        token = dict(scope["headers"]).get(b"x-profile")
+        if token is None or token.decode("latin-1") != settings.PROFILING_TOKEN:
+            return None
+        if pyinstrument is None:
+            logger.warning("⚠️ X-Profile requested but pyinstrument is not installed")
+            return None
+        return pyinstrument.Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+
+    @staticmethod
+    def _save_profile(profiler: "pyinstrument.Profiler", method: str, route: str, elapsed: float):
+        slug = re.sub(r"[^A-Za-z0-9.-]+", "_", route.strip("/")) or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{slug}.html"
+        path = os.path.join(settings.PROFILING_OUTPUT_DIR, name)
+        try:
+            os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+            logger.info("🔬 Profiled %s %s (%.1fms): %s", method, route, elapsed * 1000, path)
+        except Exception:
+            logger.exception("⚠️ Could not write profile for %s %s", method, route)
+
+
+# Admission control
+
+admission_shed = metrics.Counter(
+    "admission_shed_total", "Requests turned away before reaching a handler, by route class and reason", ["route_class", "reason"]
+)
+admission_stale = metrics.Counter(
+    "admission_stale_served_total", "Shed requests answered from cache without loading anything", ["route_class"]
+)
+admission_wait = metrics.Histogram("admission_queue_wait_seconds", "Time admitted requests spent queued", ["route_class"])
+
+# Probes and scrapes skip admission entirely, so an overloaded worker still reports its state
+EXEMPT_PATHS = {"/health", "/ready", "/metrics", f"{settings.API_V1_STR}/health", f"{settings.API_V1_STR}/ready"}
+READ_METHODS = {"GET", "HEAD"}
+# Public GET routes whose handlers only read through cache_get_or_load*, so cache-only mode can answer them
+STALE_SERVABLE = re.compile(
+    rf"^{re.escape(settings.API_V1_STR)}/(videos/feed|videos/trending/now|videos/(?!batch$|search/)[^/]+|home)$"
+)
+# The feed with stream=true is the exception: it reads Firestore directly. Values besides these
+# parse as true (or fail validation, which loads nothing either)
+_FALSE_VALUES = {"0", "off", "f", "false", "n", "no"}
+
+
+def route_class(scope: Dict[str, Any]) -> Optional[str]:
+    """The admission queue for a request, or None if it is exempt. Runs before routing, so it goes by path."""
+    path, method = scope["path"], scope["method"]
+    if path in EXEMPT_PATHS or method == "OPTIONS":
+        return None
+    if path.startswith(f"{settings.API_V1_STR}/auth/"):
+        return "auth"
+    # GraphQL has no mutations, so POSTs to it are reads
+    if method in READ_METHODS or path == f"{settings.API_V1_STR}/graphql":
+        return "read"
+    return "write"
+
+
+def _expire(waiter: "asyncio.Future[bool]"):
+    if not waiter.done():
+        waiter.set_result(False)
+
+
+class AdmissionLimiter:
+    """
+    At most `limit` requests in flight, and at most `queue_size` waiting
+    (first come, first served) for up to `queue_timeout` seconds each. A
+    finishing request hands its slot straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[bool]"] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """None once admitted, otherwise why the request was shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(self.queue_timeout, _expire, waiter)
+        try:
+            granted = await waiter
+        except asyncio.CancelledError:
+            # The client went away; pass on a slot it may have just been handed
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return None if granted else "deadline"
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+limiters: Dict[str, AdmissionLimiter] = {
+    "auth": AdmissionLimiter(
+        "auth", settings.ADMISSION_AUTH_CONCURRENCY, settings.ADMISSION_AUTH_QUEUE, settings.ADMISSION_AUTH_QUEUE_TIMEOUT
+    ),
+    "read": AdmissionLimiter(
+        "read", settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+    ),
+    "write": AdmissionLimiter(
+        "write", settings.ADMISSION_WRITE_CONCURRENCY, settings.ADMISSION_WRITE_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+    ),
+}
+
+metrics.Gauge(
+    "admission_in_flight",
+    "Admitted requests currently being handled, by route class",
+    ["route_class"],
+    callback=lambda: {(name,): limiter.active for name, limiter in limiters.items()},
+)
+metrics.Gauge(
+    "admission_queued",
+    "Requests waiting for admission, by route class",
+    ["route_class"],
+    callback=lambda: {(name,): limiter.queued for name, limiter in limiters.items()},
+)
+
+_BUSY_BODY = orjson.dumps({"detail": "Server is busy, please retry shortly"})
+
+
+async def send_busy(send):
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(_BUSY_BODY)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": _BUSY_BODY})
+
+
+class AdmissionMiddleware:
+    """
+    Bounds in-flight work per route class (auth, read, write) so a slow
+    backend makes requests fail fast instead of piling up. A shed public
+    catalog read is still answered from cache, stale or not, when it can be;
+    everything else shed gets a 503 with Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED:
+            return await self.app(scope, receive, send)
+        name = route_class(scope)
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        limiter = limiters[name]
+        queued_at = time.perf_counter()
+        reason = await limiter.acquire()
+        if reason is None:
+            admission_wait.observe(time.perf_counter() - queued_at, route_class=name)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                limiter.release()
+
+        admission_shed.inc(route_class=name, reason=reason)
+        if not self._stale_servable(scope):
+            return await send_busy(send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 500:
+                admission_stale.inc(route_class=name)
+            await send(message)
+
+        token = cache_only.set(True)
+        try:
+            # Misses raise CacheOnlyMiss, which the app turns into the same 503
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            cache_only.reset(token)
+
+    @staticmethod
+    def _stale_servable(scope) -> bool:
+        if scope["method"] not in READ_METHODS or not STALE_SERVABLE.match(scope["path"]):
+            return False
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        if any(key == "stream" and value.lower() not in _FALSE_VALUES for key, value in query):
+            return False
+        # Signed-in requests need the principal and personal data, which aren't served from cache alone
+        return not any(name == b"authorization" for name, _ in scope["headers"])
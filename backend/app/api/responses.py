@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from app.db.cache import CachedResponse
+
+
+def encode(adapter: TypeAdapter, data: Any) -> bytes:
+    """Validate data against a response model and serialize it to JSON in one pydantic-core pass."""
+    return adapter.dump_json(adapter.validate_python(data))
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """Send already-encoded JSON as-is, skipping FastAPI's response_model round trip."""
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def cacheable(body: bytes, last_modified: Optional[datetime] = None, **meta: Any) -> CachedResponse:
+    """
+    Wrap an encoded body for the response cache, stamping a strong ETag, plus
+    Last-Modified when the caller knows when the content itself last changed
+    (not when it was cached).
+    """
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    meta = {**meta, "etag": etag}
+    if isinstance(last_modified, datetime):
+        meta["last_modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return CachedResponse(body, meta)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: str) -> bool:
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def conditional_response(
+    request: Request,
+    cached: CachedResponse,
+    cache_control: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Serve a cached body with HTTP caching headers, or a bodiless 304 if the client already has it."""
+    headers = {**(headers or {}), "Cache-Control": cache_control}
+    etag = cached.meta.get("etag")
+    if etag:
+        headers["ETag"] = etag
+    if cached.meta.get("last_modified"):
+        headers["Last-Modified"] = cached.meta["last_modified"]
+
+    # If-Modified-Since only counts when the client sent no If-None-Match (RFC 9110 13.1.3)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if etag and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif cached.meta.get("last_modified"):
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and _not_modified_since(if_modified_since, cached.meta["last_modified"]):
+            return Response(status_code=304, headers=headers)
+    return json_response(cached.body, headers)
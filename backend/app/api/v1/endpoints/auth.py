@@ -18,7 +18,10 @@ async def login_access_token(
     OAuth2 compatible token login, get an access token for future requests
     """
     user = await user_crud.get_by_email(form_data.username)
-    if not user or not security.verify_password(form_data.password, user["hashed_password"]):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await security.verify_password_async(form_data.password, user["hashed_password"])
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password",
@@ -29,10 +32,13 @@ async def login_access_token(
             detail="Inactive user",
         )
     
+    if new_hash and settings.PASSWORD_REHASH_ON_LOGIN:
+        await user_crud.update_user(user["id"], {"hashed_password": new_hash})
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": security.create_access_token(
-            user["email"], expires_delta=access_token_expires
+            user["email"], expires_delta=access_token_expires, user_id=user["id"]
         ),
         "token_type": "bearer",
     }
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends
+from pydantic import TypeAdapter
+from app.api import deps
+from app.api.responses import encode, json_response
+from app.core.config import settings
+from app.cruds.user import user_crud
+from app.cruds.video import catalog_cache_key, catalog_ttl, video_crud
+from app.db.cache import cache_get_or_load
+from app.models.schemas.home import HomeScreen
+from app.models.schemas.video import User
+from app.services.playback import playback_tracker
+from app.services.trending import trending_videos
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+HOME = TypeAdapter(HomeScreen)
+
+# (rail id, title, loader)
+Rail = Tuple[str, str, Callable[[], Awaitable[Any]]]
+
+
+def _categories() -> List[str]:
+    return [c.strip() for c in settings.HOME_CATEGORIES.split(",") if c.strip()]
+
+
+async def _within_budget(awaitable: Awaitable[Any]) -> Tuple[str, Any]:
+    try:
+        return "ok", await asyncio.wait_for(awaitable, settings.HOME_RAIL_TIMEOUT)
+    except asyncio.TimeoutError:
+        return "timeout", None
+    except Exception as e:
+        logger.warning("⚠️ Home rail failed: %s", e)
+        return "error", None
+
+
+async def _shared_rail(rail_id: str, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    # Category rails follow their category's version, trending follows the whole catalog
+    category = rail_id.split(":", 1)[1] if rail_id.startswith("category:") else None
+    # The load is shielded by the cache, so a rail that times out here still fills the cache for the next request
+    return await cache_get_or_load(
+        await catalog_cache_key(f"home:{rail_id}:{settings.HOME_RAIL_LIMIT}", category),
+        loader,
+        ttl=catalog_ttl(settings.HOME_SHARED_CACHE_TTL),
+        stale_ttl=settings.HOME_SHARED_STALE_TTL,
+        lock=settings.CACHE_DISTRIBUTED_LOCK,
+    ) or []
+
+
+def _shared_rails(limit: int) -> List[Rail]:
+    async def category_rail(category: str):
+        videos, _ = await video_crud.get_page(category, limit, "views")
+        return videos
+
+    rails: List[Rail] = [("trending", "Trending Now", lambda: trending_videos(limit))]
+    rails.extend(
+        (f"category:{category}", category, lambda category=category: category_rail(category))
+        for category in _categories()
+    )
+    return rails
+
+
+def _personal_rails(user: User, limit: int) -> List[Rail]:
+    async def favorites():
+        video_ids = list(await user_crud.get_favorite_ids(user.id))[:limit]
+        return [{"videoId": video_id} for video_id in video_ids]
+
+    return [
+        ("continue_watching", "Continue Watching", lambda: playback_tracker.entries(user.id, limit)),
+        ("favorites", "My List", favorites),
+    ]
+
+
+@router.get("", response_model=HomeScreen)
+async def get_home(current_user: Optional[User] = Depends(deps.get_optional_user)) -> Any:
+    """
+    Every home screen rail in one response. Shared rails are cached for all
+    users; personal rails are only built when signed in. Each rail gets
+    HOME_RAIL_TIMEOUT seconds and comes back empty with its status set if
+    its source is slower or fails, instead of holding up the whole screen.
+    """
+    limit = settings.HOME_RAIL_LIMIT
+    shared = _shared_rails(limit)
+    personal = _personal_rails(current_user, limit) if current_user else []
+    results = await asyncio.gather(
+        *(_within_budget(_shared_rail(rail_id, loader)) for rail_id, _, loader in shared),
+        *(_within_budget(loader()) for _, _, loader in personal),
+    )
+    shared_results, personal_results = results[:len(shared)], results[len(shared):]
+
+    # Personal rails only carry ids; hydrate them together, skipping videos a shared rail already has
+    known: Dict[str, Dict[str, Any]] = {
+        video["id"]: video for status, videos in shared_results if status == "ok" for video in videos
+    }
+    missing = list(dict.fromkeys(
+        entry["videoId"]
+        for status, entries in personal_results if status == "ok"
+        for entry in entries if entry["videoId"] not in known
+    ))
+    hydrate_status = "ok"
+    if missing:
+        hydrate_status, videos = await _within_budget(video_crud.get_many(missing))
+        known.update((video["id"], video) for video in videos or [])
+
+    rails = []
+    for (rail_id, title, _), (status, videos) in zip(shared, shared_results):
+        rails.append({"id": rail_id, "title": title, "status": status, "items": videos or []})
+    for (rail_id, title, _), (status, entries) in zip(personal, personal_results):
+        items = [
+            {
+                **known[entry["videoId"]],
+                "watchedAt": str(entry["watchedAt"]) if entry.get("watchedAt") else None,
+                "positionSeconds": entry.get("positionSeconds"),
+                "durationSeconds": entry.get("durationSeconds"),
+            }
+            for entry in entries or [] if entry["videoId"] in known
+        ]
+        if status == "ok" and len(items) < len(entries) and hydrate_status != "ok":
+            status = hydrate_status
+        if status == "ok" and not items:
+            continue
+        rails.append({"id": rail_id, "title": title, "status": status, "items": items})
+
+    # Continue watching leads the screen, then trending, then the rest in their listed order
+    rails.sort(key=lambda rail: 0 if rail["id"] == "continue_watching" else 1)
+    partial = any(rail["status"] != "ok" for rail in rails)
+    if current_user or partial:
+        cache_control = "private, no-cache"
+    else:
+        cache_control = settings.HTTP_CACHE_CONTROL_FEED
+    # Signed-in and anonymous screens share this URL, so shared caches must key on the token
+    headers = {"Cache-Control": cache_control, "Vary": "Authorization"}
+    return json_response(encode(HOME, {"rails": rails, "partial": partial}), headers=headers)
@@ -1,23 +1,34 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from app.api import deps
+from app.core.config import settings
 from app.cruds.user import user_crud
-from app.models.schemas.video import User, Video
+from app.cruds.video import video_crud
+from app.models.schemas.video import PlaybackProgress, User, Video, WatchHistoryItem
+from app.services.playback import playback_tracker
+from app.services.recommendations import recommendation_index
+from app.services.trending import trending_engine, trending_videos
 
 router = APIRouter()
 
+MAX_FAVORITES_PAGE = 100
+MAX_CONTAINS_IDS = 100
+RECOMMENDATION_SEEDS = 50
+FAVORITE_SEED_WEIGHT = 2.0
+
 @router.get("/profile", response_model=User)
 async def read_user_me(
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     return current_user
 
-@router.get("/watch-history", response_model=List[Video])
+@router.get("/watch-history", response_model=List[WatchHistoryItem])
 async def get_history(
     limit: int = 20,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
-    return await user_crud.get_history(current_user.id, limit)
+    return await playback_tracker.history(current_user.id, limit)
 
 @router.post("/watch-history")
 async def record_history(
@@ -25,13 +36,88 @@ async def record_history(
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     await user_crud.add_history(current_user.id, video_id)
+    await trending_engine.record_event(video_id, weight=settings.TRENDING_HISTORY_WEIGHT)
     return {"success": True}
 
+@router.get("/recommendations", response_model=List[Video])
+async def get_recommendations(
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Neighbors of recent history and favorites, excluding anything already
+    seen. Falls back to trending while the user has no usable signal.
+    """
+    entries, favorites = await asyncio.gather(
+        playback_tracker.entries(current_user.id, RECOMMENDATION_SEEDS),
+        user_crud.get_favorite_ids(current_user.id),
+    )
+    seeds: Dict[str, float] = {}
+    for rank, entry in enumerate(entries):
+        # More recent history counts more
+        seeds[entry["videoId"]] = 1.0 / (1 + 0.1 * rank)
+    for video_id in list(favorites)[:RECOMMENDATION_SEEDS]:
+        seeds[video_id] = seeds.get(video_id, 0.0) + FAVORITE_SEED_WEIGHT
+
+    video_ids = recommendation_index.recommend(seeds, limit, exclude=list(favorites))
+    if not video_ids:
+        return await trending_videos(limit)
+    return await video_crud.get_many(video_ids)
+
+@router.post("/watch-progress")
+async def record_progress(
+    progress: PlaybackProgress,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Player heartbeats, batched by the client. Only the latest position per
+    video is kept and written to watch history every few seconds.
+    """
+    await playback_tracker.record(current_user.id, progress.heartbeats)
+    return {"success": True, "accepted": len(progress.heartbeats)}
+
 @router.get("/favorites", response_model=List[Video])
 async def get_favs(
+    response: Response,
+    limit: int = Query(20, ge=1, le=MAX_FAVORITES_PAGE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """Favorites newest first; the next page's cursor is in the X-Next-Cursor header."""
+    try:
+        videos, next_cursor = await user_crud.get_favorites(current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return videos
+
+@router.get("/favorites/contains", response_model=Dict[str, bool])
+async def favorites_contain(
+    ids: str = Query(..., min_length=1, description="Comma-separated video ids"),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
-    return await user_crud.get_favorites(current_user.id)
+    """Which of the given videos the user has favorited, e.g. to mark hearts on a whole rail at once."""
+    video_ids = [video_id.strip() for video_id in ids.split(",") if video_id.strip()]
+    if len(video_ids) > MAX_CONTAINS_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CONTAINS_IDS} ids per request")
+    return await user_crud.contains_favorites(current_user.id, video_ids)
+
+@router.put("/favorites/{video_id}")
+async def add_fav(
+    video_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    is_favorite = await user_crud.set_favorite(current_user.id, video_id, True)
+    return {"success": True, "isFavorite": is_favorite}
+
+@router.delete("/favorites/{video_id}")
+async def remove_fav(
+    video_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    is_favorite = await user_crud.set_favorite(current_user.id, video_id, False)
+    return {"success": True, "isFavorite": is_favorite}
 
 @router.post("/favorites/{video_id}")
 async def toggle_fav(
@@ -1,64 +1,160 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from app.cruds.video import video_crud
+import json
+from typing import Any, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from app.api.responses import cacheable, conditional_response, encode
+from app.cruds.video import video_crud, catalog_cache_key, catalog_ttl, decode_cursor, encode_cursor, VIDEO_CACHE_TTL
 from app.models.schemas.video import Video, VideoCreate
-from app.db.cache import cache_get, cache_set
+from app.core.config import settings
+from app.db.cache import cache_get_or_load_response
+from app.services import search
+from app.services.recommendations import recommendation_index
+from app.services.trending import trending_engine, trending_videos
+from app.services.view_counter import view_counter
 
 router = APIRouter()
 
+MAX_BATCH_IDS = 100
+MAX_FEED_LIMIT = 100
+MAX_FEED_STREAM_LIMIT = 5000
+
+# Feed and trending keys carry catalog versions, so writes invalidate them and TTLs only bound memory.
+# View counts don't bump versions, which keeps views-ordered pages on a short TTL.
+FEED_CACHE_TTL = 6 * 3600
+FEED_VIEWS_CACHE_TTL = 300
+FEED_STALE_TTL = 600
+TRENDING_CACHE_TTL = 120
+TRENDING_STALE_TTL = 300
+
+VIDEO = TypeAdapter(Video)
+VIDEO_LIST = TypeAdapter(List[Video])
+
+FeedOrder = Literal["id", "releasedAt", "views"]
+
+def _stream_feed(category: Optional[str], limit: int, order_by: str, cursor: Optional[str]) -> StreamingResponse:
+    async def lines():
+        count = 0
+        last = None
+        async for video in video_crud.stream_page(category, limit + 1, order_by, cursor):
+            if count == limit:
+                # The extra document only tells us there is another page
+                yield json.dumps({"next_cursor": encode_cursor(order_by, last)}).encode() + b"\n"
+                return
+            yield encode(VIDEO, video) + b"\n"
+            last = video
+            count += 1
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/feed", response_model=List[Video])
 async def get_home_feed(
+    request: Request,
     category: Optional[str] = None,
-    limit: int = 20
+    limit: int = Query(20, ge=1, le=MAX_FEED_STREAM_LIMIT),
+    order_by: FeedOrder = "id",
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    stream: bool = Query(False, description="Stream the page as NDJSON"),
 ) -> Any:
-    cache_key = f"feed:{category or 'all'}:{limit}"
-    
-    cached_data = await cache_get(cache_key)
-    if cached_data:
-        return cached_data
+    """
+    One page of the feed. The cursor for the next page is returned in the
+    X-Next-Cursor header, or as a final {"next_cursor": ...} line when streaming.
+    """
+    if cursor:
+        try:
+            decode_cursor(order_by, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if stream:
+        return _stream_feed(category, limit, order_by, cursor)
+    if limit > MAX_FEED_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit above {MAX_FEED_LIMIT} requires stream=true")
+
+    cache_key = await catalog_cache_key(f"feed:{category or 'all'}:{order_by}:{limit}:{cursor or 'first'}", category)
     
-    videos = await video_crud.get_multi(category=category, limit=limit)
-    await cache_set(cache_key, videos, ttl=300)
+    async def load_page():
+        videos, next_cursor = await video_crud.get_page(category, limit, order_by, cursor)
+        return cacheable(encode(VIDEO_LIST, videos), next_cursor=next_cursor)
     
-    return videos
+    page = await cache_get_or_load_response(
+        cache_key,
+        load_page,
+        ttl=catalog_ttl(FEED_VIEWS_CACHE_TTL if order_by == "views" else FEED_CACHE_TTL),
+        stale_ttl=FEED_STALE_TTL,
+        lock=settings.CACHE_DISTRIBUTED_LOCK,
+    )
+    next_cursor = page.meta.get("next_cursor")
+    return conditional_response(
+        request,
+        page,
+        settings.HTTP_CACHE_CONTROL_FEED,
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None,
+    )
 
 @router.get("/search/query", response_model=List[Video])
 async def search_videos(
     q: str = Query(..., min_length=1),
-    limit: int = 10
+    limit: int = Query(10, ge=1, le=50)
 ) -> Any:
+    results = search.search(q, limit)
+    if results is not None:
+        return results
     return await video_crud.search(q, limit)
 
+@router.get("/batch", response_model=List[Video])
+async def get_videos_batch(
+    ids: str = Query(..., min_length=1, description="Comma-separated video ids")
+) -> Any:
+    video_ids = [video_id.strip() for video_id in ids.split(",") if video_id.strip()]
+    if len(video_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return await video_crud.get_many(video_ids)
+
 @router.get("/{video_id}", response_model=Video)
-async def get_video(video_id: str) -> Any:
-    cache_key = f"video:{video_id}"
+async def get_video(video_id: str, request: Request) -> Any:
+    # Separate from the video:{id} data entries, which hold dicts for get_many
+    cache_key = f"response:video:{video_id}"
     
-    cached_video = await cache_get(cache_key)
-    if cached_video:
-        return cached_video
+    async def load_video():
+        video = await video_crud.get(video_id)
+        return cacheable(encode(VIDEO, video), last_modified=video.get("updatedAt")) if video else None
     
-    video = await video_crud.get(video_id)
-    if not video:
+    cached = await cache_get_or_load_response(cache_key, load_video, ttl=catalog_ttl(VIDEO_CACHE_TTL))
+    if not cached:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    await cache_set(cache_key, video, ttl=3600)
-    return video
+    return conditional_response(request, cached, settings.HTTP_CACHE_CONTROL_VIDEO)
+
+@router.get("/{video_id}/similar", response_model=List[Video])
+async def get_similar_videos(
+    video_id: str,
+    limit: int = Query(20, ge=1, le=50),
+) -> Any:
+    """Videos most often watched or favorited by the same people, from the offline neighbor table."""
+    return await video_crud.get_many(recommendation_index.similar(video_id, limit))
 
 @router.post("/{video_id}/view")
 async def track_view(video_id: str) -> Any:
-    await video_crud.update_views(video_id)
+    await view_counter.record(video_id)
+    await trending_engine.record_event(video_id, weight=settings.TRENDING_VIEW_WEIGHT)
     return {"success": True}
 
 @router.get("/trending/now", response_model=List[Video])
-async def get_trending_videos(limit: int = 10) -> Any:
-    cache_key = f"trending:{limit}"
-    
-    cached_data = await cache_get(cache_key)
-    if cached_data:
-        return cached_data
+async def get_trending_videos(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None
+) -> Any:
+    cache_key = await catalog_cache_key(f"trending:{category or 'all'}:{limit}", category)
     
-    videos = await video_crud.get_multi(limit=50) # Get larger set to filter
-    trending = [v for v in videos if v.get("trending", False)][:limit]
+    async def load_response():
+        return cacheable(encode(VIDEO_LIST, await trending_videos(limit, category)))
     
-    await cache_set(cache_key, trending, ttl=120)
-    return trending
+    cached = await cache_get_or_load_response(
+        cache_key,
+        load_response,
+        ttl=catalog_ttl(TRENDING_CACHE_TTL),
+        stale_ttl=TRENDING_STALE_TTL,
+        lock=settings.CACHE_DISTRIBUTED_LOCK,
+    )
+    return conditional_response(request, cached, settings.HTTP_CACHE_CONTROL_TRENDING)
@@ -5,6 +5,19 @@ from typing import List
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Cinephile API"
     API_V1_STR: str = "/api/v1"
+    ENVIRONMENT: str = "development"  # "development" runs `python main.py` with auto-reload
+    
+    # Server (python main.py)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = int(os.getenv("PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # seconds to finish in-flight requests on shutdown
+    SERVER_KEEPALIVE_TIMEOUT: int = 5
+    SERVER_ACCESS_LOG: bool = False  # request metrics already cover this in production
+    
+    # Warm start: requested in process before /ready reports ready, to fill hot caches
+    WARMUP_PATHS: str = "/api/v1/videos/feed,/api/v1/videos/feed?order_by=releasedAt,/api/v1/videos/trending/now,/api/v1/home"
+    WARMUP_TIMEOUT: float = 30.0  # seconds per warm-up phase
     
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-service-account.json")
@@ -13,9 +26,110 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-it")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 1 week
+    PRINCIPAL_CACHE_TTL: int = 300  # seconds; never longer than the token itself
+    
+    # Password hashing
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_REHASH_ON_LOGIN: bool = False  # upgrade hashes with a different cost on login
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # waiting jobs beyond this get a 503
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    REDIS_MAX_CONNECTIONS: int = 50  # per worker
+    REDIS_POOL_TIMEOUT: float = 0.5  # seconds to wait for a free pooled connection
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # seconds per command
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    # After this many consecutive connection errors or timeouts, skip Redis for the cooldown (0 disables)
+    REDIS_BREAKER_THRESHOLD: int = 5
+    REDIS_BREAKER_COOLDOWN: float = 10.0  # seconds
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_COMPRESSION: bool = False  # zstd-compress large values in Redis (needs `zstandard`)
+    CACHE_COMPRESS_MIN_BYTES: int = 4096
+    CACHE_DISTRIBUTED_LOCK: bool = True  # one loader per key across workers
+    CACHE_LOCK_TTL: float = 10.0  # seconds
+    CACHE_LOCK_WAIT: float = 2.0  # how long other workers wait for the lock holder's value
+    CACHE_VERSION_LOCAL_TTL: float = 5.0  # seconds a worker reuses namespace versions (bumps evict them sooner)
+
+    # In-process L1 cache in front of Redis (0 items disables it)
+    L1_CACHE_MAX_ITEMS: int = 10000
+    L1_CACHE_MAX_TTL: int = 60  # seconds
+    L1_CACHE_DISABLED_PREFIXES: str = ""  # comma-separated key prefixes that bypass L1
+    
+    # Home screen
+    HOME_CATEGORIES: str = "Action,Sci-Fi,Drama,Comedy,Crime"  # one rail per category, in order
+    HOME_RAIL_LIMIT: int = 20
+    HOME_RAIL_TIMEOUT: float = 0.5  # seconds; slower rails are returned empty with status "timeout"
+    HOME_SHARED_CACHE_TTL: int = 120
+    HOME_SHARED_STALE_TTL: int = 600
+    
+    # Recommendations (artifact written by build_recommendations.py)
+    RECOMMENDATIONS_PATH: str = "recommendations"
+    RECOMMENDATIONS_RELOAD_INTERVAL: float = 300.0  # seconds between checks for a new artifact
+    
+    # GraphQL (/api/v1/graphql)
+    GRAPHQL_ENABLED: bool = True
+    GRAPHQL_IDE: bool = False  # serve GraphiQL on GET
+    GRAPHQL_MAX_DEPTH: int = 6
+    GRAPHQL_MAX_ALIASES: int = 15
+    GRAPHQL_MAX_COST: int = 2000  # fields, multiplied through list sizes; see app/api/graphql/limits.py
+    
+    # HTTP caching headers for public catalog routes (CDN/browser)
+    HTTP_CACHE_CONTROL_FEED: str = "public, max-age=60, stale-while-revalidate=300"
+    HTTP_CACHE_CONTROL_VIDEO: str = "public, max-age=300, stale-while-revalidate=3600"
+    HTTP_CACHE_CONTROL_TRENDING: str = "public, max-age=30, stale-while-revalidate=120"
+    
+    # View counting (write-behind)
+    VIEW_COUNTER_BACKEND: str = "memory"  # "memory" or "redis" (shared across workers)
+    VIEW_COUNTER_FLUSH_INTERVAL: float = 5.0  # seconds
+    VIEW_COUNTER_SHARDS: int = 0  # > 1 writes to videos/{id}/view_shards/* instead of `views`
+    
+    # Playback progress (write-behind "continue watching" positions)
+    PLAYBACK_BACKEND: str = "memory"  # "memory" or "redis" (shared across workers)
+    PLAYBACK_FLUSH_INTERVAL: float = 10.0  # seconds between batched history writes
+    PLAYBACK_HOT_TTL: int = 3600  # seconds recent positions stay readable from Redis
+    
+    # Trending
+    TRENDING_HALF_LIFE_HOURS: float = 6.0
+    TRENDING_MAX_ENTRIES: int = 10000  # per leaderboard
+    TRENDING_MAINTENANCE_INTERVAL: float = 300.0  # seconds
+    TRENDING_VIEW_WEIGHT: float = 1.0
+    TRENDING_HISTORY_WEIGHT: float = 3.0
+    
+    # Search index
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_INDEX_SNAPSHOT_PATH: str = "search-index.pkl"  # empty disables snapshots
+    SEARCH_INDEX_SYNC_INTERVAL: float = 60.0  # seconds between delta syncs
+    SEARCH_INDEX_SNAPSHOT_INTERVAL: float = 600.0
+    SEARCH_INDEX_FULL_SYNC_INTERVAL: float = 3600.0  # full syncs also drop deleted videos
+    
+    # Catalog replica (whole videos collection held in each worker's memory)
+    CATALOG_REPLICA_ENABLED: bool = False
+    CATALOG_REPLICA_SYNC_INTERVAL: float = 5.0  # seconds between delta syncs
+    CATALOG_REPLICA_FULL_RELOAD_INTERVAL: float = 3600.0  # full reloads also drop deleted videos
+    # Replica reads can trail a write by a sync interval, so catalog caches filled from them stay short-lived
+    CATALOG_REPLICA_CACHE_TTL: int = 30
+    
+    # Admission control (per worker): in-flight limit, queue length and queue deadline per route class
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_AUTH_CONCURRENCY: int = 16
+    ADMISSION_AUTH_QUEUE: int = 64
+    ADMISSION_AUTH_QUEUE_TIMEOUT: float = 2.0  # seconds; sign-ins are slow anyway
+    ADMISSION_READ_CONCURRENCY: int = 256
+    ADMISSION_READ_QUEUE: int = 512
+    ADMISSION_WRITE_CONCURRENCY: int = 128
+    ADMISSION_WRITE_QUEUE: int = 256
+    ADMISSION_QUEUE_TIMEOUT: float = 0.5  # seconds a read or write may wait before it is shed
+    ADMISSION_RETRY_AFTER: int = 1  # seconds, sent with every overload 503 (including a full password hash queue)
+    
+    # Observability
+    LOG_LEVEL: str = "INFO"
+    METRICS_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # seconds between event loop lag samples
+    # Requests sending X-Profile: <token> are profiled with pyinstrument; empty disables
+    PROFILING_TOKEN: str = ""
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_OUTPUT_DIR: str = "profiles"
     
     # CORS
     ALLOWED_ORIGINS: List[str] = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
@@ -0,0 +1,188 @@
+"""
+Process-local metrics in the Prometheus text exposition format.
+
+Every worker keeps its own values; Prometheus scrapes each worker (or sums
+them) the same way it would with separate instances.
+"""
+import functools
+import inspect
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; covers L1 hits (µs) up to slow Firestore queries (seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Any]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Reads the value at scrape time instead: a number, or {label values tuple: number}
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+        _registry.append(self)
+
+    def _labels(self, key: LabelValues, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = [*zip(self.labelnames, key), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        values = self._values
+        if self.callback:
+            result = self.callback()
+            values = result if isinstance(result, dict) else {(): result}
+        for key, value in values.items():
+            yield f"{self.name}{self._labels(key)} {_format_value(value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}  # type: ignore[assignment]
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1][0] += value
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(key, [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_value(total[0])}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+crud_calls = Counter("crud_calls_total", "Data access calls by CRUD method and outcome", ["crud", "method", "outcome"])
+crud_duration = Histogram("crud_call_duration_seconds", "Data access call latency", ["crud", "method"])
+
+
+def instrument_crud(name: str):
+    """
+    Class decorator counting and timing every async static method of a CRUD
+    class. Async generators are timed until exhausted or closed.
+    """
+    def wrap(func: Callable) -> Callable:
+        method = func.__name__
+
+        def record(started: float, outcome: str):
+            crud_duration.observe(time.perf_counter() - started, crud=name, method=method)
+            crud_calls.inc(crud=name, method=method, outcome=outcome)
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                started, outcome = time.perf_counter(), "error"
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    outcome = "ok"
+                except GeneratorExit:
+                    outcome = "ok"
+                    raise
+                finally:
+                    record(started, outcome)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started, outcome = time.perf_counter(), "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                record(started, outcome)
+        return wrapper
+
+    def decorate(cls):
+        for attr, member in list(vars(cls).items()):
+            if not isinstance(member, staticmethod):
+                continue
+            func = member.__func__
+            if inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func):
+                setattr(cls, attr, staticmethod(wrap(func)))
+        return cls
+
+    return decorate
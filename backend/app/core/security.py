@@ -1,17 +1,41 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Any, Union
+from typing import Callable, Optional, Any, Tuple, TypeVar, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_rounds = settings.PASSWORD_BCRYPT_ROUNDS
+_rounds_policy = (
+    # Pinning min == max makes verify_and_update flag hashes with any other cost
+    {"bcrypt__min_rounds": _rounds, "bcrypt__max_rounds": _rounds}
+    if settings.PASSWORD_REHASH_ON_LOGIN else {}
+)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=_rounds, **_rounds_policy)
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+# bcrypt releases the GIL, so a thread pool keeps hashing off the event loop
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_password_jobs = 0
+
+T = TypeVar("T")
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already running or queued."""
+
+def create_access_token(
+    subject: Union[str, Any], expires_delta: Optional[timedelta] = None, user_id: Optional[str] = None
+) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": str(subject)}
+    if user_id:
+        # Lets a principal cache miss become a direct document get instead of an email query
+        to_encode["uid"] = user_id
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -20,3 +44,23 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+async def _run_password_job(func: Callable[..., T], *args: Any) -> T:
+    global _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise PasswordHasherBusy()
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password on the hashing pool. The second value is a replacement
+    hash when the stored one should be upgraded, otherwise None.
+    """
+    return await _run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_job(pwd_context.hash, password)
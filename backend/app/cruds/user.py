@@ -1,18 +1,141 @@
-from typing import List, Dict, Any, Optional
-from app.db.firebase import get_db
-from google.cloud import firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
-from app.cruds.video import video_crud
-from app.core.security import get_password_hash
+import base64
+import json
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.imports import lazy_import
+from app.core.metrics import instrument_crud
+from app.db.firebase import field_filter, get_db
+from app.db.cache import RedisUnavailable, cache_get, cache_get_or_load, cache_set, cache_delete, local_cache, redis_call
+from app.cruds.video import GET_ALL_CHUNK_SIZE, WRITE_BATCH_SIZE, video_crud
+from app.core.security import get_password_hash_async
+from app.models.schemas.video import User
 
+api_exceptions = lazy_import("google.api_core.exceptions")
+firestore = lazy_import("google.cloud.firestore")
+
+FAVORITES_CACHE_TTL = 600
+# Member every cached favorites set holds, so users without favorites are cached too
+_FAVORITES_LOADED = ""
+
+# Only fill an absent set: one that exists is already kept current by writes
+_FILL_FAVORITES_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 1 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call("zadd", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("expire", KEYS[1], ARGV[1])
+return 1
+"""
+
+# Apply a favorite write to a cached set; an absent set is loaded fresh on the next read
+_UPDATE_FAVORITES_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[1] == "1" then
+    redis.call("zadd", KEYS[1], "NX", ARGV[3], ARGV[2])
+else
+    redis.call("zrem", KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+def principal_cache_key(email: str) -> str:
+    return f"principal:{email}"
+
+def favorites_cache_key(user_id: str) -> str:
+    """Redis sorted set of the user's favorite video ids, scored by when they were added."""
+    return f"favorite-ids:{user_id}"
+
+def local_favorites_cache_key(user_id: str) -> str:
+    """In-process (L1) copy of the favorite ids, used while Redis is unavailable."""
+    return f"favorites:{user_id}"
+
+def _encode_favorites_cursor(added_at: Any, video_id: str) -> str:
+    position = [added_at.isoformat() if isinstance(added_at, datetime) else added_at, video_id]
+    return base64.urlsafe_b64encode(json.dumps(position, default=str).encode()).decode().rstrip("=")
+
+def _decode_favorites_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        added_at, video_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(added_at), str(video_id)
+    except Exception:
+        raise ValueError("Malformed cursor")
+
+async def hydrate_history(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Attach video data to history entries, keeping their order and the first entry per video."""
+    progress: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        progress.setdefault(entry.get('videoId'), {
+            'watchedAt': str(entry.get('watchedAt')),
+            'positionSeconds': entry.get('positionSeconds'),
+            'durationSeconds': entry.get('durationSeconds'),
+        })
+
+    videos = await video_crud.get_many(list(progress))
+    return [{**video_data, **progress[video_data['id']]} for video_data in videos]
+
+@instrument_crud("user")
 class UserCRUD:
+    @staticmethod
+    async def get(user_id: str) -> Optional[Dict[str, Any]]:
+        db = get_db()
+        if db is None: return None
+
+        doc = await db.collection('users').document(user_id).get()
+        if doc.exists:
+            user_data = doc.to_dict()
+            user_data['id'] = doc.id
+            return user_data
+        return None
+
+    @staticmethod
+    async def get_principal(email: str, user_id: Optional[str] = None, ttl: int = 300) -> Optional[Dict[str, Any]]:
+        """
+        The public fields of an authenticated user, cached under their email.
+        On a miss the user is read by id when known, else looked up by email.
+        """
+        cache_key = principal_cache_key(email)
+        principal = await cache_get(cache_key)
+        if principal:
+            return principal
+
+        user = await UserCRUD.get(user_id) if user_id else await UserCRUD.get_by_email(email)
+        if not user or user.get('email') != email:
+            return None
+        principal = User(**user).model_dump()
+        if ttl > 0:
+            await cache_set(cache_key, principal, ttl=ttl)
+        return principal
+
+    @staticmethod
+    async def update_user(user_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        db = get_db()
+        if db is None: raise Exception("Database not initialized")
+
+        user = await UserCRUD.get(user_id)
+        if not user: return None
+
+        await db.collection('users').document(user_id).update(fields)
+        # Keyed by the email the user had when the token was issued
+        await cache_delete(principal_cache_key(user['email']))
+        return {**user, **fields}
+
+    @staticmethod
+    async def set_disabled(user_id: str, disabled: bool = True) -> Optional[Dict[str, Any]]:
+        return await UserCRUD.update_user(user_id, {'disabled': disabled})
+
     @staticmethod
     async def get_by_email(email: str) -> Optional[Dict[str, Any]]:
         db = get_db()
         if db is None: return None
         
-        users = db.collection('users').where(filter=FieldFilter('email', '==', email)).limit(1).stream()
-        for user in users:
+        users = db.collection('users').where(filter=field_filter('email', '==', email)).limit(1).stream()
+        async for user in users:
             user_data = user.to_dict()
             user_data['id'] = user.id
             return user_data
@@ -25,11 +148,11 @@ class UserCRUD:
         
         # Hash password before storing
         password = user_in.pop('password')
-        user_in['hashed_password'] = get_password_hash(password)
+        user_in['hashed_password'] = await get_password_hash_async(password)
         user_in['disabled'] = False
         user_in['createdAt'] = firestore.SERVER_TIMESTAMP
         
-        _, doc_ref = db.collection('users').add(user_in)
+        _, doc_ref = await db.collection('users').add(user_in)
         user_in['id'] = doc_ref.id
         return user_in
 
@@ -39,57 +162,179 @@ class UserCRUD:
         if db is None: return
         
         doc_ref = db.collection('users').document(user_id).collection('history').document(video_id)
-        doc_ref.set({
+        # Merge so a saved playback position survives being marked as watched again
+        await doc_ref.set({
             'watchedAt': firestore.SERVER_TIMESTAMP,
             'videoId': video_id
-        })
+        }, merge=True)
 
     @staticmethod
-    async def get_history(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    async def get_history_entries(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Raw history documents (videoId, watchedAt and any playback position), newest first."""
         db = get_db()
         if db is None: return []
         
         history_docs = db.collection('users').document(user_id).collection('history').order_by('watchedAt', direction=firestore.Query.DESCENDING).limit(limit).stream()
-        
-        videos = []
-        for doc in history_docs:
-            video_id = doc.to_dict().get('videoId')
-            video_data = await video_crud.get(video_id)
-            if video_data:
-                video_data['watchedAt'] = str(doc.to_dict().get('watchedAt'))
-                videos.append(video_data)
-        return videos
+        return [doc.to_dict() async for doc in history_docs]
 
     @staticmethod
-    async def toggle_favorite(user_id: str, video_id: str) -> bool:
+    async def get_history(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        entries = await UserCRUD.get_history_entries(user_id, limit)
+        return await hydrate_history(entries)
+
+    @staticmethod
+    async def save_progress(entries: List[Dict[str, Any]]):
+        """
+        Merge playback positions into users/{userId}/history/{videoId} with
+        batched writes. Each entry has userId, videoId, watchedAt and
+        positionSeconds, plus durationSeconds when known.
+        """
+        db = get_db()
+        if db is None: raise Exception("Database not initialized")
+
+        users_ref = db.collection('users')
+        for i in range(0, len(entries), WRITE_BATCH_SIZE):
+            batch = db.batch()
+            for entry in entries[i:i + WRITE_BATCH_SIZE]:
+                data = {key: value for key, value in entry.items() if key != 'userId' and value is not None}
+                doc_ref = users_ref.document(entry['userId']).collection('history').document(entry['videoId'])
+                batch.set(doc_ref, data, merge=True)
+            await batch.commit()
+
+    @staticmethod
+    async def _load_favorite_ids(user_id: str) -> Dict[str, float]:
+        db = get_db()
+        if db is None: return {}
+
+        fav_docs = db.collection('users').document(user_id).collection('favorites').stream()
+        added = []
+        async for doc in fav_docs:
+            added_at = (doc.to_dict() or {}).get('addedAt')
+            added.append((doc.id, added_at.timestamp() if isinstance(added_at, datetime) else 0.0))
+        added.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return dict(added)
+
+    @staticmethod
+    async def _cached_favorite_ids(user_id: str) -> Optional[Dict[str, float]]:
+        """The user's favorites from their Redis set (filled from Firestore if absent), or None without Redis."""
+        key = favorites_cache_key(user_id)
+        try:
+            members = await redis_call("get", key, lambda client: client.zrevrange(key, 0, -1, withscores=True))
+        except RedisUnavailable:
+            return None
+        if members:
+            return {member.decode(): added for member, added in members if member != _FAVORITES_LOADED.encode()}
+
+        favorites = await UserCRUD._load_favorite_ids(user_id)
+        args = [FAVORITES_CACHE_TTL, "-inf", _FAVORITES_LOADED]
+        for video_id, added in favorites.items():
+            args.extend((added, video_id))
+        try:
+            await redis_call("fill", key, lambda client: client.eval(_FILL_FAVORITES_SCRIPT, 1, key, *args))
+        except RedisUnavailable:
+            pass  # read from Firestore again next time
+        return favorites
+
+    @staticmethod
+    async def get_favorite_ids(user_id: str) -> Dict[str, float]:
+        """
+        The user's favorited video ids mapped to when they were added (epoch
+        seconds), newest first. Kept in a Redis sorted set per user that
+        set_favorite updates in place, so the subcollection is only read when
+        the set has expired. Without Redis a short-lived in-process copy is used.
+        """
+        favorites = await UserCRUD._cached_favorite_ids(user_id)
+        if favorites is not None:
+            return favorites
+        return await cache_get_or_load(
+            local_favorites_cache_key(user_id),
+            lambda: UserCRUD._load_favorite_ids(user_id),
+            ttl=settings.L1_CACHE_MAX_TTL,
+        ) or {}
+
+    @staticmethod
+    async def _favorite_flags(user_id: str, video_ids: List[str]) -> Dict[str, bool]:
+        """Membership of just these videos, read from their favorite documents."""
+        db = get_db()
+        flags = {video_id: False for video_id in video_ids}
+        if db is None or not flags: return flags
+
+        favorites_ref = db.collection('users').document(user_id).collection('favorites')
+        refs = [favorites_ref.document(video_id) for video_id in flags]
+        for i in range(0, len(refs), GET_ALL_CHUNK_SIZE):
+            async for doc in db.get_all(refs[i:i + GET_ALL_CHUNK_SIZE]):
+                flags[doc.id] = doc.exists
+        return flags
+
+    @staticmethod
+    async def set_favorite(user_id: str, video_id: str, favorite: bool) -> bool:
+        """Add or remove a favorite with a single idempotent write; returns the new state."""
         db = get_db()
         if db is None: return False
         
         fav_ref = db.collection('users').document(user_id).collection('favorites').document(video_id)
-        doc = fav_ref.get()
-        
-        if doc.exists:
-            fav_ref.delete()
-            return False
+        if favorite:
+            try:
+                await fav_ref.create({
+                    'addedAt': firestore.SERVER_TIMESTAMP,
+                    'videoId': video_id
+                })
+            except api_exceptions.AlreadyExists:
+                # Already a favorite; keep the original addedAt
+                pass
         else:
-            fav_ref.set({
-                'addedAt': firestore.SERVER_TIMESTAMP,
-                'videoId': video_id
-            })
-            return True
+            await fav_ref.delete()
+
+        local_cache.delete(local_favorites_cache_key(user_id))
+        key = favorites_cache_key(user_id)
+        try:
+            await redis_call("update", key, lambda client: client.eval(
+                _UPDATE_FAVORITES_SCRIPT, 1, key, int(favorite), video_id, time.time(),
+            ))
+        except RedisUnavailable:
+            # Best effort: a set that missed this write must not outlive it
+            await cache_delete(key)
+        return favorite
 
     @staticmethod
-    async def get_favorites(user_id: str) -> List[Dict[str, Any]]:
+    async def toggle_favorite(user_id: str, video_id: str) -> bool:
+        """
+        Flip a favorite based on the cached membership, with one write (plus
+        a one-document read while Redis is down). Two taps racing can both land
+        on the same state; clients that know the state they want should use
+        set_favorite instead.
+        """
+        flags = await UserCRUD.contains_favorites(user_id, [video_id])
+        return await UserCRUD.set_favorite(user_id, video_id, not flags[video_id])
+
+    @staticmethod
+    async def contains_favorites(user_id: str, video_ids: List[str]) -> Dict[str, bool]:
+        favorites = await UserCRUD._cached_favorite_ids(user_id)
+        if favorites is None:
+            # Without Redis, read only the requested documents rather than the whole subcollection
+            return await UserCRUD._favorite_flags(user_id, video_ids)
+        return {video_id: video_id in favorites for video_id in video_ids}
+
+    @staticmethod
+    async def get_favorites(
+        user_id: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of favorite videos, newest first, and the cursor of the next page (None at the end)."""
         db = get_db()
-        if db is None: return []
-        
-        fav_docs = db.collection('users').document(user_id).collection('favorites').stream()
-        videos = []
-        for doc in fav_docs:
-            video_id = doc.id
-            video_data = await video_crud.get(video_id)
-            if video_data:
-                videos.append(video_data)
-        return videos
+        if db is None: return [], None
+
+        query = (
+            db.collection('users').document(user_id).collection('favorites')
+            .order_by('addedAt', direction=firestore.Query.DESCENDING)
+            .order_by('__name__', direction=firestore.Query.DESCENDING)
+        )
+        if cursor:
+            added_at, video_id = _decode_favorites_cursor(cursor)
+            query = query.start_after({'addedAt': added_at, '__name__': video_id})
+        # One extra document tells us whether another page exists
+        docs = [doc async for doc in query.limit(limit + 1).stream()]
+        page = docs[:limit]
+        next_cursor = _encode_favorites_cursor(page[-1].get('addedAt'), page[-1].id) if len(docs) > limit else None
+        return await video_crud.get_many([doc.id for doc in page]), next_cursor
 
 user_crud = UserCRUD()
@@ -1,64 +1,354 @@
-from typing import List, Optional, Dict, Any
-from app.db.firebase import get_db
-from google.cloud import firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
+import asyncio
+import base64
+import json
+import logging
+import random
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from app.core.config import settings
+from app.core.imports import lazy_import
+from app.core.metrics import instrument_crud
+from app.db.firebase import field_filter, get_db
+from app.db.cache import cache_bump_versions, cache_delete, cache_get_many, cache_set_many, cache_versions
+from app.db.replica import CatalogReplica, catalog_replica
+
+logger = logging.getLogger(__name__)
+
+# The google-cloud stack is slow to import; load it on first use
+api_exceptions = lazy_import("google.api_core.exceptions")
+firestore = lazy_import("google.cloud.firestore")
 
 COLLECTION_NAME = "videos"
+# Writes delete video entries directly, so they can live for hours
+VIDEO_CACHE_TTL = 6 * 3600
+# Document refs per get_all call
+GET_ALL_CHUNK_SIZE = 100
+# Firestore caps a write batch at 500 operations
+WRITE_BATCH_SIZE = 500
+VIEW_SHARDS_COLLECTION = "view_shards"
+
+# Feed orderings: public name -> (field, direction). Ties are broken by document id.
+FEED_ORDERS = {
+    "id": ("__name__", "ASCENDING"),
+    "releasedAt": ("releasedAt", "DESCENDING"),
+    "views": ("views", "DESCENDING"),
+}
+
+def encode_cursor(order_by: str, video: Dict[str, Any]) -> str:
+    field, _ = FEED_ORDERS[order_by]
+    position = [order_by, video['id']] if field == "__name__" else [order_by, video.get(field), video['id']]
+    return base64.urlsafe_b64encode(json.dumps(position, default=str).encode()).decode().rstrip("=")
+
+def decode_cursor(order_by: str, cursor: str) -> Dict[str, Any]:
+    """Turn an opaque cursor back into start_after() values; raises ValueError if it is invalid."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if not isinstance(position, list) or not position or position[0] != order_by:
+        raise ValueError("Cursor does not match the requested ordering")
+    field, _ = FEED_ORDERS[order_by]
+    if field == "__name__" and len(position) == 2:
+        return {"__name__": position[1]}
+    if len(position) == 3:
+        return {field: position[1], "__name__": position[2]}
+    raise ValueError("Malformed cursor")
+
+# Cache namespaces: one per category (plus "all") for ordinary writes, and
+# the whole catalog for changes that can't be pinned to a category
+CATALOG_NAMESPACE = "catalog"
+
+def category_namespace(category: Optional[str]) -> str:
+    return f"category:{category or 'all'}"
+
+async def catalog_cache_key(key: str, category: Optional[str] = None) -> str:
+    """key with the catalog and category versions folded in, so catalog writes invalidate it."""
+    catalog, scoped = await cache_versions(CATALOG_NAMESPACE, category_namespace(category))
+    return f"{key}:v{catalog}.{scoped}"
 
+def catalog_ttl(ttl: int) -> int:
+    """
+    TTL for a cache entry built from catalog reads. Version bumps assume the
+    refill sees the write, but with the replica enabled it can be served by a
+    worker whose replica hasn't synced it yet; a short TTL bounds how long
+    such a stale fill lives.
+    """
+    if settings.CATALOG_REPLICA_ENABLED:
+        return min(ttl, settings.CATALOG_REPLICA_CACHE_TTL)
+    return ttl
+
+def _video_keys(video_ids) -> List[str]:
+    return [key for video_id in video_ids for key in (f"video:{video_id}", f"response:video:{video_id}")]
+
+def _replica() -> Optional[CatalogReplica]:
+    """The in-memory catalog, once it has loaded and if it is enabled."""
+    if settings.CATALOG_REPLICA_ENABLED and catalog_replica.ready:
+        return catalog_replica
+    return None
+
+@instrument_crud("video")
 class VideoCRUD:
     @staticmethod
     async def get_multi(category: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        replica = _replica()
+        if replica is not None:
+            return replica.page(category.strip() if category else None, limit)
+
         db = get_db()
         if db is None: return []
         
         collection_ref = db.collection(COLLECTION_NAME)
         if category and category.strip():
-            query = collection_ref.where(filter=FieldFilter('category', '==', category)).limit(limit)
+            query = collection_ref.where(filter=field_filter('category', '==', category)).limit(limit)
         else:
             query = collection_ref.limit(limit)
             
-        docs = query.stream()
         videos = []
-        for doc in docs:
+        async for doc in query.stream():
             video_data = doc.to_dict()
             video_data['id'] = doc.id
             videos.append(video_data)
         return videos
 
+    @staticmethod
+    async def stream_page(
+        category: Optional[str] = None,
+        limit: int = 20,
+        order_by: str = "id",
+        cursor: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one page of the feed in a stable order, starting after cursor."""
+        replica = _replica()
+        if replica is not None:
+            after = decode_cursor(order_by, cursor) if cursor else None
+            for video_data in replica.page(category.strip() if category else None, limit, order_by, after):
+                yield video_data
+            return
+
+        db = get_db()
+        if db is None: return
+
+        field, direction = FEED_ORDERS[order_by]
+        query = db.collection(COLLECTION_NAME)
+        if category and category.strip():
+            query = query.where(filter=field_filter('category', '==', category))
+        query = query.order_by(field, direction=direction)
+        if field != "__name__":
+            query = query.order_by("__name__", direction=direction)
+        if cursor:
+            query = query.start_after(decode_cursor(order_by, cursor))
+
+        async for doc in query.limit(limit).stream():
+            video_data = doc.to_dict()
+            video_data['id'] = doc.id
+            yield video_data
+
+    @staticmethod
+    async def get_page(
+        category: Optional[str] = None,
+        limit: int = 20,
+        order_by: str = "id",
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return a page of videos and the cursor for the next one (None on the last page)."""
+        # One extra document tells us whether another page exists
+        videos = [video async for video in VideoCRUD.stream_page(category, limit + 1, order_by, cursor)]
+        if len(videos) <= limit:
+            return videos, None
+        return videos[:limit], encode_cursor(order_by, videos[limit - 1])
+
+    @staticmethod
+    async def stream(updated_since: Optional[datetime] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every video, or only those whose updatedAt is at or after updated_since."""
+        db = get_db()
+        if db is None: return
+
+        query = db.collection(COLLECTION_NAME)
+        if updated_since is not None:
+            query = query.where(filter=field_filter('updatedAt', '>=', updated_since))
+        async for doc in query.stream():
+            video_data = doc.to_dict()
+            video_data['id'] = doc.id
+            yield video_data
+
     @staticmethod
     async def get(video_id: str) -> Optional[Dict[str, Any]]:
+        replica = _replica()
+        if replica is not None and video_id in replica.records:
+            return replica.get(video_id)
+
         db = get_db()
         if db is None: return None
         
-        doc = db.collection(COLLECTION_NAME).document(video_id).get()
+        doc = await db.collection(COLLECTION_NAME).document(video_id).get()
         if doc.exists:
             video_data = doc.to_dict()
             video_data['id'] = doc.id
             return video_data
         return None
 
+    @staticmethod
+    async def get_many(video_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch several videos at once, returned in the order of video_ids.
+        The catalog replica and cached entries (one MGET) are served first; the
+        rest are read with chunked get_all calls and written back in one
+        pipeline. Missing ids are skipped.
+        """
+        unique_ids = list(dict.fromkeys(video_id for video_id in video_ids if video_id))
+        if not unique_ids: return []
+
+        replica = _replica()
+        found: Dict[str, Dict[str, Any]] = replica.get_many(unique_ids) if replica is not None else {}
+        uncached = [video_id for video_id in unique_ids if video_id not in found]
+        cached = await cache_get_many(f"video:{video_id}" for video_id in uncached)
+        for video_id in uncached:
+            video_data = cached.get(f"video:{video_id}")
+            if video_data:
+                found[video_id] = video_data
+
+        missing = [video_id for video_id in unique_ids if video_id not in found]
+        db = get_db()
+        if missing and db is not None:
+            collection_ref = db.collection(COLLECTION_NAME)
+
+            async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+                refs = [collection_ref.document(video_id) for video_id in chunk]
+                videos = []
+                async for doc in db.get_all(refs):
+                    if doc.exists:
+                        video_data = doc.to_dict()
+                        video_data['id'] = doc.id
+                        videos.append(video_data)
+                return videos
+
+            chunks = [missing[i:i + GET_ALL_CHUNK_SIZE] for i in range(0, len(missing), GET_ALL_CHUNK_SIZE)]
+            fetched = [video for videos in await asyncio.gather(*map(fetch_chunk, chunks)) for video in videos]
+            await cache_set_many({f"video:{video['id']}": video for video in fetched}, ttl=VIDEO_CACHE_TTL)
+            found.update((video['id'], video) for video in fetched)
+
+        return [found[video_id] for video_id in unique_ids if video_id in found]
+
     @staticmethod
     async def create(video_data: Dict[str, Any]) -> str:
         db = get_db()
         if db is None: raise Exception("Database not initialized")
         
         video_id = video_data.get("id")
+        category = video_data.get("category")
+        video_data = {**video_data, 'updatedAt': firestore.SERVER_TIMESTAMP}
         if video_id:
-            db.collection(COLLECTION_NAME).document(video_id).set(video_data)
+            await db.collection(COLLECTION_NAME).document(video_id).set(video_data)
+            # An explicit id may overwrite a video from another category
+            await cache_bump_versions(CATALOG_NAMESPACE)
+            await cache_delete(*_video_keys([video_id]))
         else:
-            _, doc_ref = db.collection(COLLECTION_NAME).add(video_data)
+            _, doc_ref = await db.collection(COLLECTION_NAME).add(video_data)
             video_id = doc_ref.id
+            await cache_bump_versions(category_namespace(category), category_namespace(None))
         return video_id
 
+    @staticmethod
+    async def upsert_many(videos: List[Dict[str, Any]]):
+        """
+        Create or overwrite videos by id in a single batched commit (at most
+        WRITE_BATCH_SIZE). Imported fields replace the stored ones; view counts
+        of existing videos are kept and new videos start at 0. Lists for the
+        categories written to are invalidated; a video moved out of another
+        category stays listed there until the caller bumps CATALOG_NAMESPACE.
+        """
+        db = get_db()
+        if db is None: raise Exception("Database not initialized")
+        if len(videos) > WRITE_BATCH_SIZE:
+            raise ValueError(f"At most {WRITE_BATCH_SIZE} videos per batch")
+
+        collection_ref = db.collection(COLLECTION_NAME)
+        batch = db.batch()
+        for video in videos:
+            data = {key: value for key, value in video.items() if key != "id"}
+            # Increment(0) creates the field on new documents without resetting existing counts
+            data.update({'views': firestore.Increment(0), 'updatedAt': firestore.SERVER_TIMESTAMP})
+            batch.set(collection_ref.document(video["id"]), data, merge=True)
+        await batch.commit()
+        await cache_delete(*_video_keys(video["id"] for video in videos))
+        await cache_bump_versions(category_namespace(None), *(category_namespace(video.get("category")) for video in videos))
+
     @staticmethod
     async def update_views(video_id: str):
         db = get_db()
         if db is None: return
         
         doc_ref = db.collection(COLLECTION_NAME).document(video_id)
-        doc_ref.update({
-            'views': firestore.Increment(1)
+        await doc_ref.update({
+            'views': firestore.Increment(1),
+            'updatedAt': firestore.SERVER_TIMESTAMP,
         })
+        await cache_delete(*_video_keys([video_id]))
+
+    @staticmethod
+    async def add_views(counts: Dict[str, int], shards: int = 0) -> Dict[str, int]:
+        """
+        Apply aggregated view increments in batched writes and return the counts
+        that could not be written. With shards > 1 each increment lands on a
+        random videos/{id}/view_shards/{n} document instead of the video itself,
+        which spreads out writes to very hot titles.
+        """
+        db = get_db()
+        if db is None: raise Exception("Database not initialized")
+
+        collection_ref = db.collection(COLLECTION_NAME)
+
+        def write(batch, video_id: str, count: int):
+            doc_ref = collection_ref.document(video_id)
+            if shards > 1:
+                shard_ref = doc_ref.collection(VIEW_SHARDS_COLLECTION).document(str(random.randrange(shards)))
+                return batch.set(shard_ref, {'count': firestore.Increment(count)}, merge=True)
+            # updatedAt lets delta syncs (catalog replica, search index) see the new count
+            data = {'views': firestore.Increment(count), 'updatedAt': firestore.SERVER_TIMESTAMP}
+            if batch is None:
+                return doc_ref.update(data)
+            return batch.update(doc_ref, data)
+
+        failed: Dict[str, int] = {}
+        items = [(video_id, count) for video_id, count in counts.items() if count]
+        for i in range(0, len(items), WRITE_BATCH_SIZE):
+            chunk = items[i:i + WRITE_BATCH_SIZE]
+            batch = db.batch()
+            for video_id, count in chunk:
+                write(batch, video_id, count)
+            try:
+                await batch.commit()
+            except Exception:
+                if shards > 1:
+                    failed.update(chunk)
+                    continue
+                # One missing video fails the whole batch; retry one by one and drop the bad ids
+                for video_id, count in chunk:
+                    try:
+                        await write(None, video_id, count)
+                    except api_exceptions.NotFound:
+                        logger.warning("⚠️ Dropping %d views for unknown video %s", count, video_id)
+                    except Exception:
+                        failed[video_id] = count
+        # Lists ordered by views keep their short TTL; bumping their namespace on every flush would defeat caching
+        if shards <= 1:
+            await cache_delete(*_video_keys(video_id for video_id, _ in items if video_id not in failed))
+        return failed
+
+    @staticmethod
+    async def get_view_count(video_id: str) -> int:
+        """Base `views` field plus anything accumulated in view shards."""
+        db = get_db()
+        if db is None: return 0
+
+        doc_ref = db.collection(COLLECTION_NAME).document(video_id)
+        doc = await doc_ref.get()
+        if not doc.exists:
+            return 0
+        total = (doc.to_dict() or {}).get('views', 0)
+        async for shard in doc_ref.collection(VIEW_SHARDS_COLLECTION).stream():
+            total += (shard.to_dict() or {}).get('count', 0)
+        return total
 
     @staticmethod
     async def search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
@@ -67,10 +357,10 @@ class VideoCRUD:
         
         collection_ref = db.collection(COLLECTION_NAME)
         # Simple prefix match
-        docs = collection_ref.where(filter=FieldFilter('title', '>=', query)).where(filter=FieldFilter('title', '<=', query + '\uf8ff')).limit(limit).stream()
+        docs = collection_ref.where(filter=field_filter('title', '>=', query)).where(filter=field_filter('title', '<=', query + '\uf8ff')).limit(limit).stream()
         
         videos = []
-        for doc in docs:
+        async for doc in docs:
             video_data = doc.to_dict()
             video_data['id'] = doc.id
             videos.append(video_data)
@@ -1,30 +1,746 @@
-import json
+import asyncio
+import logging
+import math
+import random
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, TypeVar
+import orjson
 import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from app.core import metrics
 from app.core.config import settings
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
 redis_client = None
+# Pub/sub gets its own connection: it sits idle between messages, which the pool's socket timeout would cut off
+_pubsub_client = None
+
+_MISSING = object()
+
+cache_requests = metrics.Counter(
+    "cache_requests_total", "Cache lookups by tier, key namespace and result", ["tier", "namespace", "result"]
+)
+cache_errors = metrics.Counter("cache_errors_total", "Redis errors by cache operation", ["operation"])
+cache_loads = metrics.Histogram("cache_load_duration_seconds", "Time spent in loaders filling missed keys", ["namespace"])
+# Failures that mean Redis is unreachable or too slow, as opposed to a bad command
+_UNAVAILABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class LocalCache:
+    """
+    Size-bounded, TTL-aware LRU kept in process memory (the L1 tier).
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_items: int, max_ttl: float, disabled_prefixes: Tuple[str, ...] = ()):
+        self.max_items = max_items
+        self.max_ttl = max_ttl
+        self.disabled_prefixes = disabled_prefixes
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def enabled_for(self, key: str) -> bool:
+        return self.max_items > 0 and not key.startswith(self.disabled_prefixes)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for `cooldown` seconds after `threshold`
+    consecutive failures, so requests don't each wait out a timeout. Once the
+    cooldown has passed one call is let through to probe; success closes the
+    circuit, failure keeps it open for another cooldown.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.skipped = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.cooldown:
+            # Re-arm first so concurrent callers keep skipping while this one probes
+            self.opened_at = now
+            return True
+        self.skipped += 1
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("✅ %s recovered, closing circuit", self.name)
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.threshold <= 0 or self.failures < self.threshold:
+            return
+        if self.opened_at is None:
+            self.trips += 1
+            logger.warning("⚠️ %s failed %d times in a row, skipping it for %.0fs", self.name, self.failures, self.cooldown)
+        self.opened_at = time.monotonic()
+
+
+redis_breaker = CircuitBreaker("Redis", settings.REDIS_BREAKER_THRESHOLD, settings.REDIS_BREAKER_COOLDOWN)
+
+
+def _redis_ready() -> bool:
+    """Whether to try Redis now: a client is configured and the breaker is closed (or probing)."""
+    return redis_client is not None and redis_breaker.allow()
+
+
+def _redis_failed(operation: str, target: str, error: Exception):
+    cache_errors.inc(operation=operation)
+    if isinstance(error, _UNAVAILABLE_ERRORS):
+        redis_breaker.record_failure()
+    logger.warning("⚠️ Cache %s of %s failed: %s", operation, target, error)
+
+
+class RedisUnavailable(Exception):
+    """Redis was skipped because the circuit is open, or the call failed (already counted and logged)."""
+
+
+T = TypeVar("T")
+
+async def redis_call(operation: str, target: str, call: Callable[[Any], Awaitable[T]]) -> T:
+    """
+    Run call(redis_client) through the circuit breaker, for services that use
+    Redis directly rather than through the cache functions. Raises
+    RedisUnavailable instead of waiting out timeouts while Redis is down.
+    """
+    if not _redis_ready():
+        raise RedisUnavailable(operation)
+    try:
+        result = await call(redis_client)
+    except Exception as e:
+        _redis_failed(operation, target, e)
+        raise RedisUnavailable(operation) from e
+    redis_breaker.record_success()
+    return result
+
+_CLAIM_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 0 then
+    return 0
+end
+redis.call("rename", KEYS[1], KEYS[2])
+return 1
+"""
+
+async def redis_claim(key: str, claimed_key: str) -> bool:
+    """Atomically rename key to claimed_key so exactly one worker takes its contents; False if key doesn't exist."""
+    return bool(await redis_call("claim", key, lambda client: client.eval(_CLAIM_SCRIPT, 2, key, claimed_key)))
+
+
+local_cache = LocalCache(
+    max_items=settings.L1_CACHE_MAX_ITEMS,
+    max_ttl=settings.L1_CACHE_MAX_TTL,
+    disabled_prefixes=tuple(p.strip() for p in settings.L1_CACHE_DISABLED_PREFIXES.split(",") if p.strip()),
+)
+
+# Identifies this worker on the invalidation channel so it skips its own messages
+_instance_id = uuid.uuid4().hex
+_invalidation_task: Optional[asyncio.Task] = None
+
 
 async def init_redis():
-    global redis_client
+    global redis_client, _pubsub_client, _invalidation_task
+    # A blocking pool waits briefly for a free connection instead of opening unbounded new ones
+    pool = redis.BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+    )
     try:
-        redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        redis_client = redis.Redis.from_pool(pool)
         await redis_client.ping()
-        print("✅ Redis connected successfully")
+        logger.info("✅ Redis connected successfully")
     except Exception as e:
-        print(f"⚠️ Redis connection failed: {e}")
+        logger.warning("⚠️ Redis connection failed: %s", e)
+        await pool.disconnect()
         redis_client = None
+        return
 
-async def cache_get(key: str):
-    if not redis_client: return None
+    _pubsub_client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT)
+    _invalidation_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def close_redis():
+    global redis_client, _pubsub_client, _invalidation_task
+    if _invalidation_task:
+        _invalidation_task.cancel()
+        _invalidation_task = None
+    if _pubsub_client:
+        await _pubsub_client.aclose()
+        _pubsub_client = None
+    if redis_client:
+        await redis_client.aclose()
+        redis_client = None
+
+
+async def _listen_for_invalidations():
+    """Evict L1 entries and namespace versions when another worker writes, deletes or bumps them."""
+    while _pubsub_client:
+        try:
+            pubsub = _pubsub_client.pubsub()
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # Anything published while we were disconnected is lost, so start clean
+            local_cache.clear()
+            _versions.clear()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                payload = orjson.loads(message["data"])
+                if payload.get("origin") == _instance_id:
+                    continue
+                for key in payload.get("keys", []):
+                    local_cache.delete(key)
+                    if key.startswith(VERSION_KEY_PREFIX):
+                        _versions.pop(key[len(VERSION_KEY_PREFIX):], None)
+                for prefix in payload.get("prefixes", []):
+                    local_cache.delete_prefix(prefix)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            cache_errors.inc(operation="subscribe")
+            logger.exception("⚠️ Cache invalidation listener error")
+            await asyncio.sleep(1)
+
+
+async def _publish_invalidation(*keys: str, prefixes: Tuple[str, ...] = ()):
+    try:
+        await redis_client.publish(
+            settings.CACHE_INVALIDATION_CHANNEL,
+            orjson.dumps({"origin": _instance_id, "keys": list(keys), "prefixes": list(prefixes)}),
+        )
+    except Exception as e:
+        _redis_failed("publish", "invalidation", e)
+
+
+class CacheEntry:
+    """A cached value plus its soft expiry, load time and optional metadata."""
+    __slots__ = ("value", "expires_at", "load_time", "meta")
+
+    def __init__(self, value: Any, expires_at: float, load_time: float = 0.0, meta: Optional[Dict[str, Any]] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.load_time = load_time
+        self.meta = meta or {}
+
+
+class CachedResponse(NamedTuple):
+    """Encoded response body stored as-is, so cache hits need no (de)serialization."""
+    body: bytes
+    meta: Dict[str, Any] = {}
+
+
+# Wire format: version, soft expiry, load time, flags, metadata length, metadata, payload
+_ENTRY_HEADER = struct.Struct("!BddBI")
+_ENTRY_VERSION = 1
+_FLAG_RAW = 1  # payload is opaque bytes rather than JSON
+_FLAG_ZSTD = 2
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str)
+
+def _encode_entry(entry: CacheEntry) -> bytes:
+    flags = 0
+    if isinstance(entry.value, bytes):
+        payload = entry.value
+        flags |= _FLAG_RAW
+    else:
+        payload = _dumps(entry.value)
+    if settings.CACHE_COMPRESSION and _zstd_compressor and len(payload) >= settings.CACHE_COMPRESS_MIN_BYTES:
+        payload = _zstd_compressor.compress(payload)
+        flags |= _FLAG_ZSTD
+    meta = _dumps(entry.meta) if entry.meta else b""
+    return _ENTRY_HEADER.pack(_ENTRY_VERSION, entry.expires_at, entry.load_time, flags, len(meta)) + meta + payload
+
+def _decode_entry(data: bytes) -> Optional[CacheEntry]:
+    if len(data) < _ENTRY_HEADER.size or data[0] != _ENTRY_VERSION:
+        return None
+    _, expires_at, load_time, flags, meta_length = _ENTRY_HEADER.unpack_from(data)
+    offset = _ENTRY_HEADER.size
+    meta = orjson.loads(data[offset:offset + meta_length]) if meta_length else None
+    payload = data[offset + meta_length:]
+    if flags & _FLAG_ZSTD:
+        if not _zstd_decompressor:
+            return None
+        payload = _zstd_decompressor.decompress(payload)
+    value = payload if flags & _FLAG_RAW else orjson.loads(payload)
+    return CacheEntry(value, expires_at, load_time, meta)
+
+def _make_entry(value: Any, ttl: float, load_time: float = 0.0, meta: Optional[Dict[str, Any]] = None) -> CacheEntry:
+    return CacheEntry(value, time.time() + ttl, load_time, meta)
+
+async def _get_entry(key: str) -> Optional[CacheEntry]:
+    namespace = _namespace(key)
+    use_local = local_cache.enabled_for(key)
+    if use_local:
+        entry = local_cache.get(key)
+        if entry is not _MISSING:
+            cache_requests.inc(tier="l1", namespace=namespace, result="hit")
+            return entry
+        cache_requests.inc(tier="l1", namespace=namespace, result="miss")
+
+    if not _redis_ready(): return None
     try:
-        data = await redis_client.get(key)
-        return json.loads(data) if data else None
-    except:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        data, pttl = await pipe.execute()
+    except Exception as e:
+        _redis_failed("get", key, e)
         return None
+    redis_breaker.record_success()
+
+    entry = _decode_entry(data) if data else None
+    cache_requests.inc(tier="redis", namespace=namespace, result="hit" if entry else "miss")
+    if entry is not None and use_local:
+        local_cache.set(key, entry, ttl=pttl / 1000 if pttl and pttl > 0 else local_cache.max_ttl)
+    return entry
+
+async def _set_entry(key: str, entry: CacheEntry, ttl: float):
+    if local_cache.enabled_for(key):
+        local_cache.set(key, entry, ttl=ttl)
+
+    if not _redis_ready(): return
+    try:
+        await redis_client.set(key, _encode_entry(entry), ex=max(1, math.ceil(ttl)))
+    except Exception as e:
+        _redis_failed("set", key, e)
+        return
+    redis_breaker.record_success()
+    await _publish_invalidation(key)
+
+async def _get_entries(keys: List[str]) -> Dict[str, CacheEntry]:
+    """_get_entry for many keys: L1 first, then one MGET round trip for the rest."""
+    found: Dict[str, CacheEntry] = {}
+    remote: List[str] = []
+    for key in keys:
+        if local_cache.enabled_for(key):
+            entry = local_cache.get(key)
+            if entry is not _MISSING:
+                cache_requests.inc(tier="l1", namespace=_namespace(key), result="hit")
+                found[key] = entry
+                continue
+            cache_requests.inc(tier="l1", namespace=_namespace(key), result="miss")
+        remote.append(key)
+
+    if not remote or not _redis_ready(): return found
+    # Remaining TTLs are only needed for keys that will be copied into L1
+    local_keys = [key for key in remote if local_cache.enabled_for(key)]
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.mget(remote)
+        for key in local_keys:
+            pipe.pttl(key)
+        values, *pttls = await pipe.execute()
+    except Exception as e:
+        _redis_failed("get", f"{len(remote)} keys", e)
+        return found
+    redis_breaker.record_success()
+
+    remaining = dict(zip(local_keys, pttls))
+    for key, data in zip(remote, values):
+        entry = _decode_entry(data) if data else None
+        cache_requests.inc(tier="redis", namespace=_namespace(key), result="hit" if entry else "miss")
+        if entry is None:
+            continue
+        found[key] = entry
+        if key in remaining:
+            pttl = remaining[key]
+            local_cache.set(key, entry, ttl=pttl / 1000 if pttl and pttl > 0 else local_cache.max_ttl)
+    return found
+
+async def cache_get(key: str):
+    entry = await _get_entry(key)
+    return entry.value if entry else None
 
 async def cache_set(key: str, value: any, ttl: int = 300):
-    if not redis_client: return
+    await _set_entry(key, _make_entry(value, ttl), ttl)
+
+async def cache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """Values of the keys that are cached; misses are left out."""
+    entries = await _get_entries(list(dict.fromkeys(keys)))
+    return {key: entry.value for key, entry in entries.items()}
+
+async def cache_set_many(items: Dict[str, Any], ttl: int = 300):
+    """cache_set for many keys in one pipelined round trip and a single invalidation message."""
+    if not items: return
+    entries = {key: _make_entry(value, ttl) for key, value in items.items()}
+    for key, entry in entries.items():
+        if local_cache.enabled_for(key):
+            local_cache.set(key, entry, ttl=ttl)
+
+    if not _redis_ready(): return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key, entry in entries.items():
+            pipe.set(key, _encode_entry(entry), ex=max(1, math.ceil(ttl)))
+        await pipe.execute()
+    except Exception as e:
+        _redis_failed("set", f"{len(entries)} keys", e)
+        return
+    redis_breaker.record_success()
+    await _publish_invalidation(*entries)
+
+async def cache_delete(*keys: str):
+    for key in keys:
+        local_cache.delete(key)
+
+    if not keys or not _redis_ready(): return
+    try:
+        await redis_client.delete(*keys)
+    except Exception as e:
+        _redis_failed("delete", ", ".join(keys), e)
+        return
+    redis_breaker.record_success()
+    await _publish_invalidation(*keys)
+
+async def cache_delete_prefix(*prefixes: str) -> int:
+    """Drop every key starting with one of the prefixes, here and in Redis; returns the Redis keys deleted."""
+    for prefix in prefixes:
+        local_cache.delete_prefix(prefix)
+
+    if not prefixes or not _redis_ready(): return 0
+    deleted = 0
     try:
-        await redis_client.set(key, json.dumps(value), ex=ttl)
-    except:
-        pass
+        for prefix in prefixes:
+            batch = []
+            async for key in redis_client.scan_iter(match=f"{prefix}*", count=1000):
+                batch.append(key)
+                if len(batch) >= 1000:
+                    deleted += await redis_client.delete(*batch)
+                    batch = []
+            if batch:
+                deleted += await redis_client.delete(*batch)
+    except Exception as e:
+        _redis_failed("delete", f"{', '.join(prefixes)}*", e)
+    await _publish_invalidation(prefixes=prefixes)
+    return deleted
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "l1": local_cache.stats(),
+        "redis_connected": redis_client is not None,
+        "redis_circuit_open": redis_breaker.is_open,
+    }
+
+metrics.Gauge("cache_l1_entries", "Entries currently held in the in-process cache", callback=lambda: len(local_cache._entries))
+metrics.Counter(
+    "cache_l1_removals_total",
+    "In-process cache entries removed since start, by reason",
+    ["reason"],
+    callback=lambda: {
+        ("eviction",): local_cache.evictions,
+        ("expiration",): local_cache.expirations,
+        ("invalidation",): local_cache.invalidations,
+    },
+)
+metrics.Gauge("cache_redis_connected", "1 while a Redis client is configured", callback=lambda: int(redis_client is not None))
+metrics.Gauge("cache_redis_circuit_open", "1 while Redis is being skipped after repeated failures", callback=lambda: int(redis_breaker.is_open))
+metrics.Counter("cache_redis_circuit_trips_total", "Times the Redis circuit breaker opened", callback=lambda: redis_breaker.trips)
+metrics.Counter("cache_redis_skipped_total", "Redis calls skipped while the circuit was open", callback=lambda: redis_breaker.skipped)
+
+
+# Versioned namespaces
+
+VERSION_KEY_PREFIX = "version:"
+# namespace -> (local expiry, version)
+_versions: Dict[str, Tuple[float, int]] = {}
+# Counted in process while Redis is unavailable, so a single worker still invalidates its own L1
+_local_versions: Dict[str, int] = {}
+
+async def cache_versions(*namespaces: str) -> List[int]:
+    """
+    Current version of each namespace. Folding these into cache keys lets
+    cache_bump_versions invalidate every dependent key at once, however many
+    there are; the orphaned entries simply expire. Versions are reused in
+    process for CACHE_VERSION_LOCAL_TTL seconds, and bumps made by other
+    workers evict them right away over the invalidation channel.
+    """
+    now = time.monotonic()
+    found: Dict[str, int] = {}
+    missing = []
+    for namespace in namespaces:
+        cached = _versions.get(namespace)
+        if cached and cached[0] > now:
+            found[namespace] = cached[1]
+        else:
+            missing.append(namespace)
+    if not missing:
+        return [found[namespace] for namespace in namespaces]
+
+    values = None
+    if _redis_ready():
+        try:
+            values = await redis_client.mget([VERSION_KEY_PREFIX + namespace for namespace in missing])
+            redis_breaker.record_success()
+        except Exception as e:
+            _redis_failed("get", "namespace versions", e)
+    for i, namespace in enumerate(missing):
+        if values is None:
+            found[namespace] = _local_versions.get(namespace, 0)
+        else:
+            found[namespace] = int(values[i] or 0)
+            _versions[namespace] = (now + settings.CACHE_VERSION_LOCAL_TTL, found[namespace])
+    return [found[namespace] for namespace in namespaces]
+
+async def cache_bump_versions(*namespaces: str):
+    """Atomically move each namespace to a new version, orphaning every key built with the old one."""
+    namespaces = tuple(dict.fromkeys(namespaces))
+    if not namespaces: return
+    for namespace in namespaces:
+        _local_versions[namespace] = _local_versions.get(namespace, 0) + 1
+        _versions.pop(namespace, None)
+
+    if not _redis_ready(): return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.incr(VERSION_KEY_PREFIX + namespace)
+        versions = await pipe.execute()
+    except Exception as e:
+        _redis_failed("bump", ", ".join(namespaces), e)
+        return
+    redis_breaker.record_success()
+    expires_at = time.monotonic() + settings.CACHE_VERSION_LOCAL_TTL
+    for namespace, version in zip(namespaces, versions):
+        _versions[namespace] = (expires_at, version)
+    await _publish_invalidation(*(VERSION_KEY_PREFIX + namespace for namespace in namespaces))
+
+
+# Stampede protection
+
+Loader = Callable[[], Awaitable[Any]]
+
+# Set while serving a request that admission control shed: any cached entry,
+# however stale, is returned, and loaders are never called
+cache_only: ContextVar[bool] = ContextVar("cache_only", default=False)
+
+
+class CacheOnlyMiss(Exception):
+    """A key had to be loaded while only cached data could be served."""
+
+_inflight: Dict[str, "asyncio.Future[Optional[CacheEntry]]"] = {}
+_background_refreshes: Set["asyncio.Task[Any]"] = set()
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+async def _acquire_lock(key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis_client.set(f"lock:{key}", token, nx=True, px=int(settings.CACHE_LOCK_TTL * 1000))
+    except Exception as e:
+        # Redis trouble should not stop us from loading
+        _redis_failed("lock", key, e)
+        return ""
+    return token if acquired else None
+
+async def _release_lock(key: str, token: str):
+    try:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        # The lock expires on its own after CACHE_LOCK_TTL
+        _redis_failed("unlock", key, e)
+
+async def _wait_for_entry(key: str) -> Optional[CacheEntry]:
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await _get_entry(key)
+        if entry and entry.expires_at > time.time():
+            return entry
+    return None
+
+async def _fill(key: str, loader: Loader, ttl: float, stale_ttl: float, lock: bool, background: bool) -> Optional[CacheEntry]:
+    token = None
+    if lock and _redis_ready():
+        token = await _acquire_lock(key)
+        if token is None:
+            # Another worker is already loading this key
+            if background:
+                return None
+            entry = await _wait_for_entry(key)
+            if entry:
+                return entry
+
+    try:
+        started = time.perf_counter()
+        value = await loader()
+        if value is None:
+            return None
+        load_time = time.perf_counter() - started
+        cache_loads.observe(load_time, namespace=_namespace(key))
+        if isinstance(value, CachedResponse):
+            entry = _make_entry(value.body, ttl, load_time, meta=value.meta)
+        else:
+            entry = _make_entry(value, ttl, load_time)
+        await _set_entry(key, entry, ttl + stale_ttl)
+        return entry
+    finally:
+        if token:
+            await _release_lock(key, token)
+
+def _single_flight(key: str, loader: Loader, ttl: float, stale_ttl: float, lock: bool, background: bool = False) -> "asyncio.Future[Optional[CacheEntry]]":
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_fill(key, loader, ttl, stale_ttl, lock, background))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    return future
+
+def _refresh_in_background(key: str, loader: Loader, ttl: float, stale_ttl: float, lock: bool):
+    if key in _inflight:
+        return
+    task = _single_flight(key, loader, ttl, stale_ttl, lock, background=True)
+    _background_refreshes.add(task)
+
+    def _done(t: "asyncio.Task[Any]"):
+        _background_refreshes.discard(t)
+        if not t.cancelled() and t.exception():
+            logger.warning("⚠️ Background refresh of %s failed: %s", key, t.exception())
+
+    task.add_done_callback(_done)
+
+async def _get_or_load_entry(
+    key: str, loader: Loader, ttl: int, stale_ttl: int, lock: bool, beta: float
+) -> Optional[CacheEntry]:
+    entry = await _get_entry(key)
+    if cache_only.get():
+        if entry is None:
+            raise CacheOnlyMiss(key)
+        return entry
+    if entry is not None:
+        now = time.time()
+        # XFetch: -log(U) is exponential, so slow loaders start refreshing earlier
+        early = entry.load_time * beta * -math.log(random.random() or 1e-12)
+        if now + early >= entry.expires_at:
+            if now >= entry.expires_at and stale_ttl <= 0:
+                return await asyncio.shield(_single_flight(key, loader, ttl, stale_ttl, lock))
+            _refresh_in_background(key, loader, ttl, stale_ttl, lock)
+        return entry
+
+    return await asyncio.shield(_single_flight(key, loader, ttl, stale_ttl, lock))
+
+async def cache_get_or_load(
+    key: str,
+    loader: Loader,
+    ttl: int = 300,
+    stale_ttl: int = 0,
+    lock: bool = False,
+    beta: float = 1.0,
+) -> Any:
+    """
+    Return the cached value for key, calling loader() to fill it on a miss.
+
+    Concurrent misses in this worker share a single loader call; with lock=True
+    a short Redis lock also keeps other workers from loading the same key.
+    With stale_ttl > 0 an expired value is still served for that many seconds
+    while a background task refreshes it. Values are also refreshed early with
+    a probability that rises as expiry approaches (scaled by beta), which
+    spreads reloads out instead of having them all fire at the TTL.
+    None results are not cached.
+    """
+    entry = await _get_or_load_entry(key, loader, ttl, stale_ttl, lock, beta)
+    return entry.value if entry else None
+
+async def cache_get_or_load_response(
+    key: str,
+    loader: Callable[[], Awaitable[Optional[CachedResponse]]],
+    ttl: int = 300,
+    stale_ttl: int = 0,
+    lock: bool = False,
+    beta: float = 1.0,
+) -> Optional[CachedResponse]:
+    """cache_get_or_load for pre-encoded responses: hits return the stored bytes untouched."""
+    entry = await _get_or_load_entry(key, loader, ttl, stale_ttl, lock, beta)
+    return CachedResponse(entry.value, entry.meta) if entry else None
@@ -1,36 +1,64 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from app.core.config import settings
+import logging
 import os
 import json
+import threading
+
+logger = logging.getLogger(__name__)
 
 db = None
+# Warm start initializes in a worker thread while early requests may call get_db() on the loop;
+# only initialize_firebase waits for it
+_init_lock = threading.Lock()
 
 def initialize_firebase():
+    """Create the Firestore client once; concurrent callers wait for the first one to finish."""
+    with _init_lock:
+        if db is None:
+            _initialize()
+
+def _initialize():
     global db
+    # firebase_admin pulls in the whole google-cloud/grpc stack, so it is only imported here
+    import firebase_admin
+    from firebase_admin import credentials, firestore_async
+
     if not firebase_admin._apps:
         if os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
             try:
                 with open(settings.FIREBASE_CREDENTIALS_PATH, 'r') as f:
                     cred_dict = json.load(f)
-                
+
                 # Ensure private_key has correct newlines
                 if 'private_key' in cred_dict:
                     cred_dict['private_key'] = cred_dict['private_key'].replace('\\n', '\n')
-                
+
                 cred = credentials.Certificate(cred_dict)
                 firebase_admin.initialize_app(cred)
-                db = firestore.client()
-                print("✅ Firestore initialized successfully")
+                db = firestore_async.client()
+                logger.info("✅ Firestore initialized successfully")
             except Exception as e:
-                print(f"❌ Error initializing Firebase: {e}")
+                logger.error("❌ Error initializing Firebase: %s", e)
                 db = None
         else:
-            print(f"❌ Error: Firebase credentials not found at {settings.FIREBASE_CREDENTIALS_PATH}")
+            logger.error("❌ Firebase credentials not found at %s", settings.FIREBASE_CREDENTIALS_PATH)
     else:
-        db = firestore.client()
+        db = firestore_async.client()
 
 def get_db():
-    if db is None:
-        initialize_firebase()
+    """
+    The Firestore client, created on first use. While another thread is
+    creating it (warm start) this returns None instead of blocking the event
+    loop, so callers answer as if Firestore were unavailable.
+    """
+    if db is None and _init_lock.acquire(blocking=False):
+        try:
+            if db is None:
+                _initialize()
+        finally:
+            _init_lock.release()
     return db
+
+def field_filter(field: str, op: str, value):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+    return FieldFilter(field, op, value)
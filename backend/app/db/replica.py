@@ -0,0 +1,174 @@
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core import metrics
+
+# Stored per video; anything else on the document is dropped
+VIDEO_FIELDS = (
+    "id", "title", "description", "thumbnailUrl", "videoUrl", "category",
+    "duration", "trending", "views", "releasedAt", "updatedAt",
+)
+# Fields whose change can move a video within an ordering
+ORDER_FIELDS = {"id": "id", "releasedAt": "releasedAt", "views": "views"}
+DESCENDING_ORDERS = {"releasedAt", "views"}
+ALL = ""
+
+
+class VideoRecord:
+    """One video with fixed slots instead of a per-instance dict."""
+    __slots__ = VIDEO_FIELDS
+
+    def __init__(self, video: Dict[str, Any]):
+        for field in VIDEO_FIELDS:
+            value = video.get(field)
+            # Categories repeat across the whole catalog; share one string each
+            if field == "category" and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, field, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: value for field in VIDEO_FIELDS if (value := getattr(self, field)) is not None}
+
+
+class _Ordering:
+    """Ids of one category sorted ascending by (sort value, id); DESC orders read it backwards."""
+    __slots__ = ("keys", "ids")
+
+    def __init__(self, records: Iterable[VideoRecord], field: str):
+        if field == "id":
+            pairs = sorted((record.id, record.id) for record in records)
+        else:
+            pairs = sorted(
+                ((getattr(record, field), record.id), record.id)
+                for record in records if getattr(record, field) is not None
+            )
+        self.keys = [key for key, _ in pairs]
+        self.ids = [video_id for _, video_id in pairs]
+
+
+class CatalogReplica:
+    """
+    The whole video catalog in process memory, indexed by id and category.
+    Sorted orderings are built lazily per (category, order) and dropped when a
+    change could affect them, so a burst of view count updates costs one
+    re-sort of the views order rather than one per update.
+    """
+
+    def __init__(self):
+        self.records: Dict[str, VideoRecord] = {}
+        self.categories: Dict[str, set] = {}
+        self._orderings: Dict[Tuple[str, str], _Ordering] = {}
+        self.watermark: Optional[datetime] = None
+        self.ready = False
+        self.last_sync = 0.0
+        self.memory_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _invalidate(self, categories: Iterable[Optional[str]], orders: Iterable[str]):
+        for category in {ALL, *(c for c in categories if c)}:
+            for order in orders:
+                self._orderings.pop((category, order), None)
+
+    def upsert(self, video: Dict[str, Any]):
+        record = VideoRecord(video)
+        old = self.records.get(record.id)
+        self.records[record.id] = record
+        if old is None:
+            self.categories.setdefault(record.category, set()).add(record.id)
+            self._invalidate([record.category], ORDER_FIELDS)
+            return
+        if old.category != record.category:
+            self.categories.get(old.category, set()).discard(record.id)
+            self.categories.setdefault(record.category, set()).add(record.id)
+            self._invalidate([old.category, record.category], ORDER_FIELDS)
+            return
+        changed = [order for order, field in ORDER_FIELDS.items() if getattr(old, field) != getattr(record, field)]
+        if changed:
+            self._invalidate([record.category], changed)
+
+    def remove(self, video_id: str):
+        record = self.records.pop(video_id, None)
+        if record is not None:
+            self.categories.get(record.category, set()).discard(video_id)
+            self._invalidate([record.category], ORDER_FIELDS)
+
+    def replace_all(self, videos: Iterable[Dict[str, Any]]):
+        """Swap in a complete catalog, which also drops videos deleted since the last full load."""
+        fresh = CatalogReplica()
+        for video in videos:
+            fresh.upsert(video)
+        self.records, self.categories, self._orderings = fresh.records, fresh.categories, {}
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        record = self.records.get(video_id)
+        return record.to_dict() if record else None
+
+    def get_many(self, video_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        records = self.records
+        return {video_id: records[video_id].to_dict() for video_id in video_ids if video_id in records}
+
+    def _ordering(self, category: Optional[str], order_by: str) -> _Ordering:
+        key = (category or ALL, order_by)
+        ordering = self._orderings.get(key)
+        if ordering is None:
+            if category:
+                records = (self.records[video_id] for video_id in self.categories.get(category, ()))
+            else:
+                records = self.records.values()
+            ordering = self._orderings[key] = _Ordering(records, ORDER_FIELDS[order_by])
+        return ordering
+
+    def page(
+        self,
+        category: Optional[str],
+        limit: int,
+        order_by: str = "id",
+        after: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Same videos and order as the Firestore feed query; `after` is a decoded feed cursor."""
+        ordering = self._ordering(category, order_by)
+        field = ORDER_FIELDS[order_by]
+        cursor_key = None
+        if after is not None:
+            cursor_key = after["__name__"] if field == "id" else (after.get(field), after["__name__"])
+
+        if order_by in DESCENDING_ORDERS:
+            end = len(ordering.ids) if cursor_key is None else bisect_left(ordering.keys, cursor_key)
+            ids = ordering.ids[max(0, end - limit):end][::-1]
+        else:
+            start = 0 if cursor_key is None else bisect_right(ordering.keys, cursor_key)
+            ids = ordering.ids[start:start + limit]
+        return [self.records[video_id].to_dict() for video_id in ids]
+
+    def estimate_memory(self, sample_size: int = 1000) -> int:
+        """Approximate bytes held by records, sampled because walking every string is slow."""
+        if not self.records:
+            self.memory_bytes = 0
+            return 0
+        sample = random.sample(list(self.records.values()), min(sample_size, len(self.records)))
+        per_record = sum(
+            sys.getsizeof(record) + sum(sys.getsizeof(getattr(record, field)) for field in VIDEO_FIELDS if field != "category")
+            for record in sample
+        ) / len(sample)
+        self.memory_bytes = int(per_record * len(self.records) + sys.getsizeof(self.records))
+        return self.memory_bytes
+
+
+catalog_replica = CatalogReplica()
+
+metrics.Gauge("catalog_replica_videos", "Videos held in the in-process catalog replica", callback=lambda: len(catalog_replica))
+metrics.Gauge(
+    "catalog_replica_memory_bytes",
+    "Estimated memory used by catalog replica records",
+    callback=lambda: catalog_replica.memory_bytes,
+)
+metrics.Gauge(
+    "catalog_replica_staleness_seconds",
+    "Seconds since the catalog replica last synced successfully",
+    callback=lambda: time.time() - catalog_replica.last_sync if catalog_replica.last_sync else -1,
+)
@@ -1,15 +1,34 @@
-from fastapi import FastAPI
+import time
+
+# Cold start fallback where process age isn't available
+_started = time.perf_counter()
+
+import asyncio
+import logging
+from typing import Optional
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.graphql import graphql_router
+from app.api.middleware import AdmissionMiddleware, MetricsMiddleware
 from app.api.v1.api import api_router
+from app.core import metrics
 from app.core.config import settings
-from app.db.firebase import initialize_firebase
-from app.db.cache import init_redis
+from app.core.security import PasswordHasherBusy
+from app.db.cache import CacheOnlyMiss, close_redis
+from app.services import loop_monitor  # noqa: F401 - registers the lag sampler
+from app.services.background import stop_background_tasks
+from app.services.warmup import readiness, warm_start
+
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+# Innermost, so shed responses still get CORS headers and are counted by MetricsMiddleware
+app.add_middleware(AdmissionMiddleware)
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -17,16 +36,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Added last so it is outermost and times everything, CORS included
+app.add_middleware(MetricsMiddleware)
+
+_warm_start: Optional[asyncio.Task] = None
 
 @app.on_event("startup")
 async def startup_event():
-    initialize_firebase()
-    await init_redis()
+    global _warm_start
+    # Runs in the background so the server starts listening (and /health answers) right away
+    _warm_start = asyncio.create_task(warm_start(app, _started))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    readiness.status = "stopping"
+    if _warm_start and not _warm_start.done():
+        _warm_start.cancel()
+    # Flushes buffered views, playback positions and the search snapshot before Redis goes away
+    await stop_background_tasks()
+    await close_redis()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts in progress, please retry shortly"},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+    )
+
+@app.exception_handler(CacheOnlyMiss)
+async def cache_only_miss_handler(request: Request, exc: CacheOnlyMiss):
+    # A shed request that the cache alone couldn't answer
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+    )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+if settings.GRAPHQL_ENABLED:
+    app.include_router(graphql_router, prefix=f"{settings.API_V1_STR}/graphql", include_in_schema=False)
+
 @app.get("/health")
 @app.get(f"{settings.API_V1_STR}/health")
 async def health_check():
+    """Liveness: the process is up and its event loop responds."""
     return {"status": "ok"}
+
+@app.get("/ready")
+@app.get(f"{settings.API_V1_STR}/ready")
+async def readiness_check():
+    """Readiness: warmed up, connected to Firestore and not shutting down; 503 otherwise."""
+    checks = readiness.checks()
+    status = "degraded" if readiness.ready and not checks["firestore"] else readiness.status
+    return JSONResponse(status_code=200 if status == "ready" else 503, content={"status": status, "checks": checks})
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
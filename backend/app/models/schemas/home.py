@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List, Literal
+from app.models.schemas.video import WatchHistoryItem
+
+class HomeRail(BaseModel):
+    id: str
+    title: str
+    status: Literal["ok", "timeout", "error"] = "ok"
+    items: List[WatchHistoryItem] = []
+
+class HomeScreen(BaseModel):
+    rails: List[HomeRail]
+    partial: bool = False
@@ -22,6 +22,19 @@ class Video(VideoBase):
     class Config:
         from_attributes = True
 
+class WatchHistoryItem(Video):
+    watchedAt: Optional[str] = None
+    positionSeconds: Optional[float] = None
+    durationSeconds: Optional[float] = None
+
+class PlaybackHeartbeat(BaseModel):
+    videoId: str = Field(..., min_length=1)
+    position: float = Field(..., ge=0, description="Playback position in seconds")
+    duration: Optional[float] = Field(None, gt=0, description="Media length in seconds, if known")
+
+class PlaybackProgress(BaseModel):
+    heartbeats: List[PlaybackHeartbeat] = Field(..., min_length=1, max_length=100)
+
 class UserBase(BaseModel):
     email: str
     display_name: Optional[str] = Field(None, alias="displayName")
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs an async callable every `interval` seconds until stopped. On stop,
+    `on_stop` (by default the same callable) runs once more so nothing pending is lost.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Awaitable[None]],
+        on_stop: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.on_stop = on_stop or func
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Background task %s failed: %s", self.name, e)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.on_stop()
+        except Exception as e:
+            logger.warning("⚠️ Final run of %s failed: %s", self.name, e)
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register(task: PeriodicTask) -> PeriodicTask:
+    _tasks.append(task)
+    return task
+
+
+def start_background_tasks():
+    for task in _tasks:
+        task.start()
+
+
+async def stop_background_tasks():
+    for task in reversed(_tasks):
+        await task.stop()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from app.core import metrics
+from app.core.config import settings
+from app.cruds.video import video_crud
+from app.db.replica import catalog_replica
+from app.services.background import PeriodicTask, register
+
+logger = logging.getLogger(__name__)
+
+# Re-read a little before the watermark so writes committed out of order aren't missed
+SYNC_OVERLAP = timedelta(seconds=5)
+
+sync_duration = metrics.Histogram(
+    "catalog_replica_sync_duration_seconds",
+    "Time spent pulling catalog changes into the replica",
+    ["kind"],
+)
+
+_sync_lock = asyncio.Lock()
+_last_full_reload = 0.0
+_initial_load: Optional[asyncio.Task] = None
+
+
+async def sync_catalog_replica(full: bool = False):
+    """Apply videos changed since the last sync, or reload everything when a full reload is due."""
+    if _sync_lock.locked():
+        return
+    async with _sync_lock:
+        due = time.monotonic() - _last_full_reload >= settings.CATALOG_REPLICA_FULL_RELOAD_INTERVAL
+        await _sync(full or due or not catalog_replica.ready)
+
+
+async def _sync(full: bool):
+    global _last_full_reload
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    since = None if full or not catalog_replica.watermark else catalog_replica.watermark - SYNC_OVERLAP
+    watermark = None if full else catalog_replica.watermark
+
+    videos = []
+    changed = 0
+    async for video in video_crud.stream(updated_since=since):
+        updated_at = video.get("updatedAt")
+        if isinstance(updated_at, datetime) and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+        if full:
+            videos.append(video)
+        else:
+            catalog_replica.upsert(video)
+            changed += 1
+    if full:
+        catalog_replica.replace_all(videos)
+        _last_full_reload = time.monotonic()
+        catalog_replica.estimate_memory()
+    elif changed:
+        catalog_replica.estimate_memory()
+
+    # Legacy documents have no updatedAt; after a full load start deltas from now
+    catalog_replica.watermark = watermark or now
+    catalog_replica.last_sync = time.time()
+    catalog_replica.ready = True
+    sync_duration.observe(time.perf_counter() - started, kind="full" if full else "delta")
+    if full:
+        logger.info("✅ Catalog replica loaded (%d videos, ~%d KiB)", len(catalog_replica), catalog_replica.memory_bytes // 1024)
+
+
+async def start_catalog_replica() -> Optional[asyncio.Task]:
+    """Load the catalog in the background; reads use Firestore until the first load completes."""
+    global _initial_load
+    if not settings.CATALOG_REPLICA_ENABLED:
+        return None
+    _initial_load = asyncio.create_task(sync_catalog_replica(full=True))
+    return _initial_load
+
+
+if settings.CATALOG_REPLICA_ENABLED:
+    register(PeriodicTask(
+        "catalog-replica-sync",
+        settings.CATALOG_REPLICA_SYNC_INTERVAL,
+        sync_catalog_replica,
+        on_stop=lambda: asyncio.sleep(0),
+    ))
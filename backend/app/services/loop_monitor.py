@@ -0,0 +1,33 @@
+import asyncio
+from typing import Optional
+from app.core import metrics
+from app.core.config import settings
+from app.services.background import PeriodicTask, register
+
+loop_lag = metrics.Histogram(
+    "event_loop_lag_seconds",
+    "How late the sampler's timer fired, i.e. how long the loop was blocked",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+last_loop_lag = metrics.Gauge("event_loop_lag_last_seconds", "Event loop lag at the most recent sample")
+
+_expected: Optional[float] = None
+
+
+async def sample_loop_lag():
+    """Runs every EVENT_LOOP_LAG_INTERVAL; anything past the scheduled wake-up is time the loop was busy."""
+    global _expected
+    now = asyncio.get_running_loop().time()
+    if _expected is not None:
+        lag = max(0.0, now - _expected)
+        loop_lag.observe(lag)
+        last_loop_lag.set(lag)
+    _expected = now + settings.EVENT_LOOP_LAG_INTERVAL
+
+
+register(PeriodicTask(
+    "event-loop-lag",
+    settings.EVENT_LOOP_LAG_INTERVAL,
+    sample_loop_lag,
+    on_stop=lambda: asyncio.sleep(0),
+))
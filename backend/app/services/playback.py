@@ -0,0 +1,184 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import orjson
+from app.core.config import settings
+from app.cruds.user import hydrate_history, user_crud
+from app.db import cache
+from app.models.schemas.video import PlaybackHeartbeat
+from app.services.background import PeriodicTask, register
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = "progress:dirty"
+
+Progress = Dict[str, Any]
+
+
+def _hot_key(user_id: str) -> str:
+    return f"progress:{user_id}"
+
+
+class PlaybackTracker:
+    """
+    Write-behind playback positions. Heartbeats only update the latest
+    position per user and video, in memory or in a Redis hash per user;
+    positions that changed are written to the history subcollection in
+    batches every PLAYBACK_FLUSH_INTERVAL.
+    """
+
+    def __init__(self, backend: str, hot_ttl: int):
+        self.backend = backend
+        self.hot_ttl = hot_ttl
+        # user id -> video id -> latest position, so reads only touch their own user's entries
+        self._dirty: Dict[str, Dict[str, Progress]] = {}
+        # Being written right now; still served to readers until the write lands
+        self._flushing: Dict[str, Dict[str, Progress]] = {}
+        # Claimed from Redis but not read back yet; retried before claiming a new batch
+        self._flushing_key: Optional[str] = None
+        self.heartbeats = 0
+        self.written = 0
+        self.flushes = 0
+
+    def _use_redis(self) -> bool:
+        return self.backend == "redis" and cache.redis_client is not None
+
+    async def record(self, user_id: str, heartbeats: List[PlaybackHeartbeat]):
+        now = time.time()
+        latest: Dict[str, Progress] = {}
+        for heartbeat in heartbeats:
+            # Within one request the last heartbeat for a video wins
+            latest[heartbeat.videoId] = {"p": heartbeat.position, "d": heartbeat.duration, "t": now}
+        self.heartbeats += len(heartbeats)
+
+        if self._use_redis():
+            async def write(client):
+                pipe = client.pipeline(transaction=False)
+                pipe.hset(_hot_key(user_id), mapping={video_id: orjson.dumps(p) for video_id, p in latest.items()})
+                pipe.expire(_hot_key(user_id), self.hot_ttl)
+                pipe.sadd(DIRTY_KEY, *(orjson.dumps([user_id, video_id]) for video_id in latest))
+                await pipe.execute()
+
+            try:
+                await cache.redis_call("record", _hot_key(user_id), write)
+                return
+            except cache.RedisUnavailable:
+                pass  # kept in this worker instead and flushed from here
+        self._dirty.setdefault(user_id, {}).update(latest)
+
+    async def _hot(self, user_id: str) -> Dict[str, Progress]:
+        hot = dict(self._flushing.get(user_id, {}))
+        hot.update(self._dirty.get(user_id, {}))
+        if self._use_redis():
+            try:
+                stored = await cache.redis_call("get", _hot_key(user_id), lambda client: client.hgetall(_hot_key(user_id)))
+            except cache.RedisUnavailable:
+                stored = {}
+            for video_id, raw in stored.items():
+                progress = orjson.loads(raw)
+                video_id = video_id.decode()
+                if video_id not in hot or progress["t"] > hot[video_id]["t"]:
+                    hot[video_id] = progress
+        return hot
+
+    async def history(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Watch history with positions and video data, newest first."""
+        return await hydrate_history(await self.entries(user_id, limit))
+
+    async def entries(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Raw history entries, newest first; unflushed heartbeats override stored entries."""
+        hot = await self._hot(user_id)
+        entries = [
+            entry for entry in await user_crud.get_history_entries(user_id, limit)
+            if entry.get("videoId") not in hot
+        ]
+        entries.extend(_entry(user_id, video_id, progress) for video_id, progress in hot.items())
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        entries.sort(key=lambda entry: entry.get("watchedAt") or oldest, reverse=True)
+        return entries[:limit]
+
+    async def _drain_redis(self) -> Dict[Tuple[str, str], Progress]:
+        if self._flushing_key is None:
+            # Claiming is atomic, so exactly one worker writes each batch of dirty positions
+            flushing_key = f"progress:flushing:{uuid.uuid4().hex}"
+            try:
+                if not await cache.redis_claim(DIRTY_KEY, flushing_key):
+                    return {}
+            except cache.RedisUnavailable:
+                return {}
+            self._flushing_key = flushing_key
+        try:
+            members, values = await cache.redis_call(
+                "drain", self._flushing_key, lambda client: _read_dirty(client, self._flushing_key)
+            )
+        except cache.RedisUnavailable:
+            # The batch stays under its key and is read again on the next flush
+            return {}
+        self._flushing_key = None
+        # A position missing here expired from Redis before it was flushed
+        return {member: orjson.loads(raw) for member, raw in zip(members, values) if raw}
+
+    async def flush(self):
+        self._flushing, self._dirty = self._dirty, {}
+        if self._use_redis():
+            for (user_id, video_id), progress in (await self._drain_redis()).items():
+                videos = self._flushing.setdefault(user_id, {})
+                if video_id not in videos or progress["t"] > videos[video_id]["t"]:
+                    videos[video_id] = progress
+        entries = [
+            _entry(user_id, video_id, progress)
+            for user_id, videos in self._flushing.items()
+            for video_id, progress in videos.items()
+        ]
+        if not entries:
+            return
+
+        try:
+            await user_crud.save_progress(entries)
+            self.written += len(entries)
+        except Exception as e:
+            logger.warning("⚠️ Saving playback progress failed, will retry: %s", e)
+            # Retried on the next flush unless a newer heartbeat replaced it meanwhile
+            for user_id, videos in self._flushing.items():
+                pending = self._dirty.setdefault(user_id, {})
+                for video_id, progress in videos.items():
+                    pending.setdefault(video_id, progress)
+        finally:
+            self._flushing = {}
+        self.flushes += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "heartbeats": self.heartbeats,
+            "written": self.written,
+            "flushes": self.flushes,
+            "pending_local": sum(len(videos) for videos in self._dirty.values()),
+        }
+
+
+def _entry(user_id: str, video_id: str, progress: Progress) -> Dict[str, Any]:
+    return {
+        "userId": user_id,
+        "videoId": video_id,
+        "watchedAt": datetime.fromtimestamp(progress["t"], timezone.utc),
+        "positionSeconds": progress["p"],
+        "durationSeconds": progress["d"],
+    }
+
+
+async def _read_dirty(client, key: str) -> Tuple[List[Tuple[str, str]], List[Any]]:
+    """The (user, video) pairs in a claimed dirty set and their latest positions; deletes the set."""
+    members = [tuple(orjson.loads(member)) for member in await client.smembers(key)]
+    pipe = client.pipeline(transaction=False)
+    for user_id, video_id in members:
+        pipe.hget(_hot_key(user_id), video_id)
+    values = await pipe.execute()
+    await client.delete(key)
+    return members, values
+
+
+playback_tracker = PlaybackTracker(backend=settings.PLAYBACK_BACKEND, hot_ttl=settings.PLAYBACK_HOT_TTL)
+
+register(PeriodicTask("playback-progress-flush", settings.PLAYBACK_FLUSH_INTERVAL, playback_tracker.flush))
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+from app.core.config import settings
+from app.core.imports import lazy_import
+from app.services.background import PeriodicTask, register
+
+logger = logging.getLogger(__name__)
+
+# Only loaded once an artifact exists
+np = lazy_import("numpy")
+
+ARTIFACT_VERSION = 1
+NEIGHBORS_FILE = "neighbors.npy"
+SCORES_FILE = "scores.npy"
+ITEMS_FILE = "items.json"
+META_FILE = "meta.json"
+
+
+def save_artifact(path: str, item_ids: Sequence[str], neighbors, scores, meta: Dict):
+    """
+    Write a neighbor table as a new directory and atomically repoint the
+    `path` symlink at it, so running workers never see a half-written artifact.
+    neighbors is an (items x K) int32 array of row numbers, padded with -1;
+    scores holds the matching float32 similarities.
+    """
+    base = os.path.abspath(path)
+    directory = f"{base}-{time.strftime('%Y%m%d%H%M%S')}"
+    os.makedirs(directory)
+    np.save(os.path.join(directory, NEIGHBORS_FILE), neighbors.astype(np.int32, copy=False))
+    np.save(os.path.join(directory, SCORES_FILE), scores.astype(np.float32, copy=False))
+    with open(os.path.join(directory, ITEMS_FILE), "w") as f:
+        json.dump(list(item_ids), f)
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({**meta, "version": ARTIFACT_VERSION, "builtAt": time.time(), "items": len(item_ids)}, f)
+
+    link = f"{base}.tmp"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(directory, link)
+    os.replace(link, base)
+    return directory
+
+
+class RecommendationIndex:
+    """
+    Precomputed item-item neighbors, memory-mapped from the artifact written
+    by build_recommendations.py. Lookups are array slices; nothing is computed
+    per request beyond summing a few neighbor lists.
+    """
+
+    def __init__(self):
+        self.item_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.neighbors = None
+        self.scores = None
+        self.source: Optional[str] = None
+        self.meta: Dict = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.neighbors is not None
+
+    def load(self, path: str) -> bool:
+        """(Re)load the artifact if `path` now points somewhere new; returns whether it changed."""
+        if np is None or not os.path.exists(path):
+            return False
+        source = os.path.realpath(path)
+        if source == self.source:
+            return False
+        with open(os.path.join(source, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported recommendations artifact version {meta.get('version')}")
+        with open(os.path.join(source, ITEMS_FILE)) as f:
+            item_ids = json.load(f)
+        neighbors = np.load(os.path.join(source, NEIGHBORS_FILE), mmap_mode="r")
+        scores = np.load(os.path.join(source, SCORES_FILE), mmap_mode="r")
+
+        self.item_ids, self.rows = item_ids, {item_id: row for row, item_id in enumerate(item_ids)}
+        self.neighbors, self.scores, self.meta, self.source = neighbors, scores, meta, source
+        return True
+
+    def similar(self, video_id: str, limit: int = 20) -> List[str]:
+        row = self.rows.get(video_id)
+        if row is None or not self.ready:
+            return []
+        return [self.item_ids[n] for n in self.neighbors[row, :limit] if n >= 0]
+
+    def recommend(self, seeds: Dict[str, float], limit: int = 20, exclude: Sequence[str] = ()) -> List[str]:
+        """Rank the neighbors of weighted seed videos by summed weighted similarity."""
+        seed_rows = [(self.rows[video_id], weight) for video_id, weight in seeds.items() if video_id in self.rows]
+        if not seed_rows or not self.ready:
+            return []
+        rows = np.fromiter((row for row, _ in seed_rows), dtype=np.int64, count=len(seed_rows))
+        weights = np.fromiter((weight for _, weight in seed_rows), dtype=np.float32, count=len(seed_rows))
+
+        candidates = self.neighbors[rows].ravel()
+        contributions = (self.scores[rows] * weights[:, None]).ravel()
+        valid = candidates >= 0
+        items, inverse = np.unique(candidates[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=contributions[valid])
+
+        excluded = [self.rows[video_id] for video_id in (*seeds, *exclude) if video_id in self.rows]
+        totals[np.isin(items, excluded)] = -np.inf
+        count = min(limit, int(np.isfinite(totals).sum()))
+        if count == 0:
+            return []
+        top = np.argpartition(-totals, count - 1)[:count]
+        top = top[np.argsort(-totals[top])]
+        return [self.item_ids[row] for row in items[top]]
+
+
+recommendation_index = RecommendationIndex()
+
+
+async def reload_recommendations():
+    if not settings.RECOMMENDATIONS_PATH:
+        return
+    try:
+        if recommendation_index.load(settings.RECOMMENDATIONS_PATH):
+            logger.info("✅ Recommendations loaded (%d videos)", len(recommendation_index.item_ids))
+    except Exception as e:
+        logger.warning("⚠️ Could not load recommendations: %s", e)
+
+
+register(PeriodicTask(
+    "recommendations-reload",
+    settings.RECOMMENDATIONS_RELOAD_INTERVAL,
+    reload_recommendations,
+    on_stop=lambda: asyncio.sleep(0),
+))
@@ -0,0 +1,331 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import tempfile
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.cruds.video import video_crud
+from app.services.background import PeriodicTask, register
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 1.0}
+K1 = 1.2
+B = 0.75
+# Typeahead: how the last query token is expanded to indexed terms
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 8
+PREFIX_BOOST = 0.8
+# Misspellings: tokens with no match are expanded to terms sharing trigrams
+MAX_FUZZY_EXPANSIONS = 3
+MIN_TRIGRAM_SIMILARITY = 0.4
+FUZZY_BOOST = 0.6
+# Longer posting lists are only scanned for their highest-impact documents;
+# terms reached through prefix or fuzzy expansion get a smaller budget
+MAX_POSTINGS_SCAN = 256
+MAX_EXPANSION_SCAN = 64
+# Delta syncs re-read a little history to tolerate commit/clock skew
+SYNC_OVERLAP = timedelta(seconds=5)
+SNAPSHOT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index over title, description and category with BM25 ranking.
+    Documents are keyed by video id and can be added, replaced or removed at
+    any time; the stored video dicts are what search() returns.
+    """
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._lengths: List[float] = []
+        self._doc_terms: List[Tuple[str, ...]] = []
+        self._total_length = 0.0
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+        self._impact: Dict[str, List[Tuple[int, float]]] = {}
+        self.watermark: Optional[datetime] = None
+        self.last_full_sync: Optional[datetime] = None
+        self.ready = False
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, video: Dict[str, Any]):
+        video_id = video["id"]
+        if video_id in self._slots:
+            self.remove(video_id)
+
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(video.get(field) or "")):
+                frequencies[token] += weight
+
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = video_id
+            self._lengths[slot] = 0.0
+            self._doc_terms[slot] = ()
+        else:
+            slot = len(self._ids)
+            self._ids.append(video_id)
+            self._lengths.append(0.0)
+            self._doc_terms.append(())
+
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for gram in trigrams(term):
+                    self._trigrams[gram].add(term)
+                self._vocab_dirty = True
+            postings[slot] = frequency
+            self._impact.pop(term, None)
+
+        length = sum(frequencies.values())
+        self._lengths[slot] = length
+        self._doc_terms[slot] = tuple(frequencies)
+        self._total_length += length
+        self._slots[video_id] = slot
+        self.docs[video_id] = video
+        self.dirty = True
+
+    def remove(self, video_id: str):
+        slot = self._slots.pop(video_id, None)
+        if slot is None:
+            return
+        for term in self._doc_terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            self._impact.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    self._trigrams[gram].discard(term)
+                self._vocab_dirty = True
+        self._total_length -= self._lengths[slot]
+        self._ids[slot] = None
+        self._doc_terms[slot] = ()
+        self._free.append(slot)
+        del self.docs[video_id]
+        self.dirty = True
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        start = bisect.bisect_left(self._vocab, prefix)
+        end = bisect.bisect_left(self._vocab, prefix + "\uffff", lo=start)
+        candidates = [term for term in self._vocab[start:end] if term != prefix]
+        if len(candidates) <= MAX_PREFIX_EXPANSIONS:
+            return candidates
+        return heapq.nlargest(MAX_PREFIX_EXPANSIONS, candidates, key=lambda term: len(self._postings[term]))
+
+    def _fuzzy_terms(self, token: str) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        matches = []
+        for term, count in shared.items():
+            # Jaccard over trigram sets; a term of n characters has n padded trigrams
+            similarity = count / (len(grams) + len(term) - count)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                matches.append((term, similarity))
+        return heapq.nlargest(MAX_FUZZY_EXPANSIONS, matches, key=itemgetter(1))
+
+    def _expand(self, token: str, typeahead: bool) -> List[Tuple[str, float, int]]:
+        terms = [(token, 1.0, MAX_POSTINGS_SCAN)] if token in self._postings else []
+        if typeahead and len(token) >= MIN_PREFIX_LENGTH:
+            terms.extend((term, PREFIX_BOOST, MAX_EXPANSION_SCAN) for term in self._prefix_terms(token))
+        if not terms and len(token) >= 3:
+            terms.extend(
+                (term, FUZZY_BOOST * similarity, MAX_EXPANSION_SCAN)
+                for term, similarity in self._fuzzy_terms(token)
+            )
+        return terms
+
+    def _impacts(self, term: str, postings: Dict[int, float], avg_length: float, budget: int) -> Iterable[Tuple[int, float]]:
+        """Per-document BM25 term weight (without idf), best first once the list is long."""
+        impact = self._impact.get(term)
+        if impact is None:
+            lengths = self._lengths
+            weights = (
+                (slot, frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * lengths[slot] / avg_length)))
+                for slot, frequency in postings.items()
+            )
+            if len(postings) <= budget:
+                return weights
+            # Cached until a document containing the term changes
+            impact = self._impact[term] = heapq.nlargest(MAX_POSTINGS_SCAN, weights, key=itemgetter(1))
+        return impact[:budget]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        tokens = tokenize(query)
+        if not tokens or not self._slots:
+            return []
+
+        count = len(self._slots)
+        avg_length = self._total_length / count or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for position, token in enumerate(tokens):
+            for term, boost, budget in self._expand(token, typeahead=position == len(tokens) - 1):
+                postings = self._postings[term]
+                df = len(postings)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5)) * boost
+                for slot, weight in self._impacts(term, postings, avg_length, budget):
+                    scores[slot] += idf * weight
+
+        top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [self.docs[self._ids[slot]] for slot, _ in top]
+
+    def dump(self) -> bytes:
+        state = {key: value for key, value in vars(self).items() if key not in ("ready", "dirty", "_impact")}
+        state["_trigrams"] = dict(self._trigrams)
+        return pickle.dumps((SNAPSHOT_VERSION, state), protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def parse(data: bytes) -> Dict[str, Any]:
+        version, state = pickle.loads(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported search snapshot version {version}")
+        state["_trigrams"] = defaultdict(set, state["_trigrams"])
+        return state
+
+    def restore(self, state: Dict[str, Any]):
+        vars(self).update(state)
+        self._impact = {}
+        self.dirty = False
+
+
+search_index = SearchIndex()
+_last_snapshot = 0.0
+_sync_lock = asyncio.Lock()
+_initial_sync: Optional[asyncio.Task] = None
+
+
+def _write_snapshot(path: str, data: bytes):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".search-index-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_snapshot(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return SearchIndex.parse(f.read())
+
+
+async def save_snapshot():
+    global _last_snapshot
+    if not settings.SEARCH_INDEX_SNAPSHOT_PATH:
+        return
+    data = search_index.dump()
+    search_index.dirty = False
+    await asyncio.to_thread(_write_snapshot, settings.SEARCH_INDEX_SNAPSHOT_PATH, data)
+    _last_snapshot = time.monotonic()
+
+
+async def sync_search_index(force_snapshot: bool = False):
+    """
+    Pull videos changed since the last sync into the index. Deletions leave
+    nothing for a delta to find, so every SEARCH_INDEX_FULL_SYNC_INTERVAL (and
+    on the first run) all videos are read and any the index still holds that
+    weren't seen are dropped.
+    """
+    if _sync_lock.locked():
+        return
+    async with _sync_lock:
+        await _sync(force_snapshot)
+
+
+async def _sync(force_snapshot: bool):
+    started = datetime.now(timezone.utc)
+    last_full = search_index.last_full_sync
+    full = last_full is None or (started - last_full).total_seconds() >= settings.SEARCH_INDEX_FULL_SYNC_INTERVAL
+    since = search_index.watermark - SYNC_OVERLAP if search_index.watermark and not full else None
+    watermark = search_index.watermark
+    seen: Set[str] = set()
+    async for video in video_crud.stream(updated_since=since):
+        seen.add(video["id"])
+        # Full syncs see every video again; only reindex the ones that changed
+        if search_index.docs.get(video["id"]) != video:
+            search_index.add(video)
+        updated_at = video.get("updatedAt")
+        if isinstance(updated_at, datetime) and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+    if full:
+        for video_id in [video_id for video_id in search_index.docs if video_id not in seen]:
+            search_index.remove(video_id)
+        search_index.last_full_sync = started
+        search_index.dirty = True  # snapshots remember when, so restarts don't all start with a full pass
+    # Legacy documents have no updatedAt; after a full load start deltas from now
+    search_index.watermark = watermark or started
+    search_index.ready = True
+
+    due = time.monotonic() - _last_snapshot >= settings.SEARCH_INDEX_SNAPSHOT_INTERVAL
+    if search_index.dirty and (due or force_snapshot):
+        await save_snapshot()
+
+
+async def start_search_index() -> Optional[asyncio.Task]:
+    """Warm start from the last snapshot, then catch up with Firestore in the background (the returned task)."""
+    global _initial_sync
+    if not settings.SEARCH_INDEX_ENABLED:
+        return None
+    path = settings.SEARCH_INDEX_SNAPSHOT_PATH
+    if path and os.path.exists(path):
+        try:
+            search_index.restore(await asyncio.to_thread(_read_snapshot, path))
+            search_index.ready = True
+            logger.info("✅ Search index loaded from snapshot (%d videos)", len(search_index))
+        except Exception as e:
+            logger.warning("⚠️ Ignoring unreadable search snapshot: %s", e)
+    _initial_sync = asyncio.create_task(sync_search_index(force_snapshot=True))
+    return _initial_sync
+
+
+def search(query: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+    """Answer from the index, or None while it is still being built."""
+    if not settings.SEARCH_INDEX_ENABLED or not search_index.ready:
+        return None
+    return search_index.search(query, limit)
+
+
+if settings.SEARCH_INDEX_ENABLED:
+    register(PeriodicTask(
+        "search-index-sync",
+        settings.SEARCH_INDEX_SYNC_INTERVAL,
+        sync_search_index,
+        on_stop=lambda: save_snapshot() if search_index.dirty else asyncio.sleep(0),
+    ))
@@ -0,0 +1,195 @@
+import heapq
+import math
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.cruds.video import video_crud
+from app.db import cache
+from app.services.background import PeriodicTask, register
+
+KEY_PREFIX = "trending:scores"
+EPOCH_KEY = f"{KEY_PREFIX}:epoch"
+BOARDS_KEY = f"{KEY_PREFIX}:boards"
+GLOBAL_BOARD = "all"
+# Rebase once weights reach 2^64 so scores stay far away from float overflow
+REBASE_AFTER_HALVINGS = 64
+
+# Weights grow as 2^((now - epoch) / half_life), which is the same as decaying
+# every existing score by half each half-life, without touching old entries.
+_RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+local increment = tonumber(ARGV[3]) * math.pow(2, (now - epoch) / tonumber(ARGV[2]))
+for i = 3, #KEYS do
+    redis.call('ZINCRBY', KEYS[i], increment, ARGV[4])
+    redis.call('SADD', KEYS[2], KEYS[i])
+end
+return tostring(increment)
+"""
+
+_REBASE_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then return 0 end
+local half_life = tonumber(ARGV[2])
+local halvings = math.floor((tonumber(ARGV[1]) - epoch) / half_life)
+if halvings < tonumber(ARGV[3]) then return 0 end
+local factor = math.pow(2, -halvings)
+for _, key in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    redis.call('ZUNIONSTORE', key, 1, key, 'WEIGHTS', factor)
+end
+redis.call('SET', KEYS[1], tostring(epoch + halvings * half_life))
+return halvings
+"""
+
+
+def _board_key(category: Optional[str]) -> str:
+    return f"{KEY_PREFIX}:{category or GLOBAL_BOARD}"
+
+
+class _LocalBoard:
+    """
+    In-process leaderboard that keeps its leaders ranked as they are scored.
+    Scores only ever rise (rebasing scales them all alike), so a video can
+    only enter the leaders by overtaking the last of them, and top(k) never
+    has to scan the whole board.
+    """
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self._leaders: List[str] = []  # best first, the top `_size` videos
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def add(self, video_id: str, increment: float):
+        score = self.scores.get(video_id, 0.0) + increment
+        self.scores[video_id] = score
+        if not self._size:
+            return
+        leaders = self._leaders
+        if video_id in leaders:
+            leaders.remove(video_id)
+        elif len(leaders) >= self._size:
+            if score <= self.scores[leaders[-1]]:
+                return
+            leaders.pop()
+        # Leaders are few, so a linear scan beats keeping scores in a separate sorted list
+        position = next((i for i, other in enumerate(leaders) if self.scores[other] < score), len(leaders))
+        leaders.insert(position, video_id)
+
+    def top(self, limit: int) -> List[str]:
+        if limit > self._size:
+            self._size = limit
+            self._rank()
+        return self._leaders[:limit]
+
+    def scale(self, factor: float):
+        for video_id in self.scores:
+            self.scores[video_id] *= factor
+
+    def trim(self, max_entries: int):
+        if len(self.scores) > max_entries:
+            self.scores = dict(heapq.nlargest(max_entries, self.scores.items(), key=lambda item: item[1]))
+            self._rank()
+
+    def _rank(self):
+        self._leaders = heapq.nlargest(self._size, self.scores, key=self.scores.__getitem__)
+
+
+class TrendingEngine:
+    """
+    Time-decayed popularity leaderboards, one global and one per category.
+    Scores live in Redis sorted sets so top-K is O(log n + k); without Redis an
+    in-process copy of the same scores is used instead.
+    """
+
+    def __init__(self, half_life: float, max_entries: int):
+        self.half_life = half_life
+        self.max_entries = max_entries
+        self._epoch: Optional[float] = None
+        self._boards: Dict[str, _LocalBoard] = defaultdict(_LocalBoard)
+
+    async def record(self, video_id: str, weight: float = 1.0, category: Optional[str] = None):
+        keys = [_board_key(None)] + ([_board_key(category)] if category else [])
+        now = time.time()
+        try:
+            await cache.redis_call("record", "trending", lambda client: client.eval(
+                _RECORD_SCRIPT, 2 + len(keys), EPOCH_KEY, BOARDS_KEY, *keys,
+                now, self.half_life, weight, video_id,
+            ))
+            return
+        except cache.RedisUnavailable:
+            pass  # scored locally instead
+
+        if self._epoch is None:
+            self._epoch = now
+        increment = weight * math.pow(2, (now - self._epoch) / self.half_life)
+        for key in keys:
+            self._boards[key].add(video_id, increment)
+
+    async def record_event(self, video_id: str, weight: float = 1.0):
+        """
+        Record engagement for an existing video. Its category comes from the
+        catalog (replica or cached video entry), never from the client, so
+        unknown ids and made-up categories can't reach the boards.
+        """
+        videos = await video_crud.get_many([video_id])
+        if not videos:
+            return
+        await self.record(video_id, weight, category=videos[0].get("category"))
+
+    async def top(self, limit: int, category: Optional[str] = None) -> List[str]:
+        key = _board_key(category)
+        try:
+            video_ids = await cache.redis_call("get", key, lambda client: client.zrevrange(key, 0, limit - 1))
+            return [video_id.decode() for video_id in video_ids]
+        except cache.RedisUnavailable:
+            pass
+        board = self._boards.get(key)
+        return board.top(limit) if board else []
+
+    async def maintain(self):
+        """Rebase scores before they overflow and trim every board to max_entries."""
+        now = time.time()
+        async def maintain_redis(client):
+            await client.eval(_REBASE_SCRIPT, 2, EPOCH_KEY, BOARDS_KEY, now, self.half_life, REBASE_AFTER_HALVINGS)
+            for key in await client.smembers(BOARDS_KEY):
+                await client.zremrangebyrank(key, 0, -(self.max_entries + 1))
+
+        try:
+            await cache.redis_call("maintain", "trending", maintain_redis)
+        except cache.RedisUnavailable:
+            pass  # retried on the next run
+
+        if self._epoch is not None:
+            halvings = math.floor((now - self._epoch) / self.half_life)
+            if halvings >= REBASE_AFTER_HALVINGS:
+                factor = math.pow(2, -halvings)
+                for board in self._boards.values():
+                    board.scale(factor)
+                self._epoch += halvings * self.half_life
+        for board in self._boards.values():
+            board.trim(self.max_entries)
+
+
+trending_engine = TrendingEngine(
+    half_life=settings.TRENDING_HALF_LIFE_HOURS * 3600,
+    max_entries=settings.TRENDING_MAX_ENTRIES,
+)
+
+async def trending_videos(limit: int, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Top videos by decayed engagement, or the editorially flagged titles until anything is recorded."""
+    video_ids = await trending_engine.top(limit, category=category)
+    if video_ids:
+        return await video_crud.get_many(video_ids)
+    videos = await video_crud.get_multi(category=category, limit=50)
+    return [v for v in videos if v.get("trending", False)][:limit]
+
+
+register(PeriodicTask("trending-maintenance", settings.TRENDING_MAINTENANCE_INTERVAL, trending_engine.maintain))
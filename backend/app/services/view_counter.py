@@ -0,0 +1,97 @@
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+from app.core.config import settings
+from app.cruds.video import video_crud
+from app.db import cache
+from app.services.background import PeriodicTask, register
+
+PENDING_KEY = "views:pending"
+
+
+class ViewCounter:
+    """
+    Write-behind view counting. Views are coalesced per video in memory (or in a
+    shared Redis hash) and flushed to Firestore as batched increments.
+    """
+
+    def __init__(self, backend: str, shards: int = 0):
+        self.backend = backend
+        self.shards = shards
+        self._pending: Counter = Counter()
+        # Claimed from Redis but not read back yet; retried before claiming a new batch
+        self._flushing_key: Optional[str] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    def _use_redis(self) -> bool:
+        return self.backend == "redis" and cache.redis_client is not None
+
+    async def record(self, video_id: str, count: int = 1):
+        self.recorded += count
+        if self._use_redis():
+            try:
+                await cache.redis_call("record", "views", lambda client: client.hincrby(PENDING_KEY, video_id, count))
+                return
+            except cache.RedisUnavailable:
+                pass  # counted in this worker instead and flushed from here
+        self._pending[video_id] += count
+
+    async def _drain_redis(self) -> Dict[str, int]:
+        if self._flushing_key is None:
+            # Claiming is atomic, so exactly one worker gets each batch of pending views
+            flushing_key = f"views:flushing:{uuid.uuid4().hex}"
+            try:
+                if not await cache.redis_claim(PENDING_KEY, flushing_key):
+                    return {}
+            except cache.RedisUnavailable:
+                return {}
+            self._flushing_key = flushing_key
+        try:
+            counts = await cache.redis_call(
+                "drain", self._flushing_key, lambda client: _read_and_delete(client, self._flushing_key)
+            )
+        except cache.RedisUnavailable:
+            # The batch stays under its key and is read again on the next flush
+            return {}
+        self._flushing_key = None
+        return {video_id.decode(): int(count) for video_id, count in counts.items()}
+
+    async def flush(self):
+        pending, self._pending = self._pending, Counter()
+        if self._use_redis():
+            pending.update(await self._drain_redis())
+        if not pending:
+            return
+
+        try:
+            failed = await video_crud.add_views(dict(pending), shards=self.shards)
+        except Exception:
+            failed = dict(pending)
+        # Whatever did not make it is retried on the next flush
+        self._pending.update(failed)
+        self.flushed += sum(pending.values()) - sum(failed.values())
+        self.flushes += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "pending_local": sum(self._pending.values()),
+        }
+
+
+async def _read_and_delete(client, key: str) -> Dict[bytes, bytes]:
+    # One transaction, so a failure leaves the hash intact for the retry
+    pipe = client.pipeline(transaction=True)
+    pipe.hgetall(key)
+    pipe.delete(key)
+    counts, _ = await pipe.execute()
+    return counts
+
+
+view_counter = ViewCounter(backend=settings.VIEW_COUNTER_BACKEND, shards=settings.VIEW_COUNTER_SHARDS)
+
+register(PeriodicTask("view-counter-flush", settings.VIEW_COUNTER_FLUSH_INTERVAL, view_counter.flush))
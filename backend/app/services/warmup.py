@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+from app.core import metrics
+from app.core.config import settings
+from app.core.imports import lazy_import
+from app.db import cache, firebase
+from app.db.replica import catalog_replica
+from app.services.background import start_background_tasks
+from app.services.catalog_replica import start_catalog_replica
+from app.services.recommendations import reload_recommendations
+from app.services.search import search_index, start_search_index
+
+logger = logging.getLogger(__name__)
+
+httpx = lazy_import("httpx")
+
+cold_start = metrics.Gauge("app_cold_start_seconds", "Time this worker spent starting up, by phase", ["phase"])
+
+
+class Readiness:
+    """Whether this worker should get traffic: "starting", then "ready", then "stopping" on shutdown."""
+
+    def __init__(self):
+        self.status = "starting"
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def checks(self) -> Dict[str, Optional[bool]]:
+        return {
+            "firestore": firebase.db is not None,
+            "redis": cache.redis_client is not None and not cache.redis_breaker.is_open,
+            "catalogReplica": catalog_replica.ready if settings.CATALOG_REPLICA_ENABLED else None,
+            "searchIndex": search_index.ready if settings.SEARCH_INDEX_ENABLED else None,
+        }
+
+
+readiness = Readiness()
+
+metrics.Gauge("app_ready", "1 once this worker has warmed up and accepts traffic", callback=lambda: int(readiness.ready))
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process was created (Linux only), so interpreter and framework imports count too."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields after it are fixed
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+async def _prefill_caches(app):
+    """Request the hottest public routes in process, which fills their caches and warms every code path on the way."""
+    paths = [path.strip() for path in settings.WARMUP_PATHS.split(",") if path.strip()]
+    if not paths:
+        return
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        responses = await asyncio.gather(*(client.get(path) for path in paths), return_exceptions=True)
+    for path, response in zip(paths, responses):
+        if isinstance(response, Exception) or response.status_code >= 400:
+            logger.warning("⚠️ Warm-up request %s failed: %s", path, getattr(response, "status_code", response))
+
+
+async def warm_start(app, started: float):
+    """
+    Everything a worker needs before it should take traffic, run after the
+    server is already listening so /health answers throughout. /ready turns
+    healthy at the end.
+    """
+    phase_started = time.perf_counter()
+    # Importing firebase_admin is slow and CPU-bound; in a thread it overlaps with connecting to Redis
+    await asyncio.gather(asyncio.to_thread(firebase.initialize_firebase), cache.init_redis())
+    start_background_tasks()
+    cold_start.set(time.perf_counter() - phase_started, phase="init")
+
+    phase_started = time.perf_counter()
+    await start_search_index()
+    await reload_recommendations()
+    replica_load = await start_catalog_replica()
+    if replica_load is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(replica_load), settings.WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Catalog replica still loading; serving from Firestore until it is ready")
+    cold_start.set(time.perf_counter() - phase_started, phase="indexes")
+
+    phase_started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_prefill_caches(app), settings.WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Cache warm-up timed out")
+    cold_start.set(time.perf_counter() - phase_started, phase="warmup")
+
+    if readiness.status == "starting":
+        readiness.status = "ready"
+    total = _process_age() or time.perf_counter() - started
+    cold_start.set(total, phase="total")
+    logger.info("🚀 Worker %d ready %.2fs after start", os.getpid(), total)
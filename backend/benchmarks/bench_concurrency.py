@@ -0,0 +1,67 @@
+"""
+Checks that parallel ``GET /videos/{id}`` requests overlap on one worker.
+
+Every fake Firestore call sleeps for ``--latency`` seconds. With a blocking
+data layer N requests take about N * latency; with the async client they
+should finish in roughly one latency.
+
+    python -m benchmarks.bench_concurrency --requests 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.db import firebase
+from app.main import app
+from benchmarks.fakes import FakeAsyncClient
+
+
+async def run(requests: int, latency: float) -> float:
+    fake = FakeAsyncClient()
+    for i in range(requests):
+        await fake.collection("videos").document(f"video-{i}").set({
+            "title": f"Video {i}",
+            "description": "Benchmark video",
+            "thumbnailUrl": "https://example.com/thumb.jpg",
+            "videoUrl": "https://example.com/video.m3u8",
+            "category": "Action",
+            "duration": "1h 30m",
+        })
+    fake.latency = latency
+    firebase.db = fake
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.get(f"{settings.API_V1_STR}/videos/video-{i}") for i in range(requests)
+        ))
+        elapsed = time.perf_counter() - start
+
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise SystemExit(f"❌ {len(failed)} requests failed (first: {failed[0].status_code})")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.requests, args.latency))
+    serial = args.requests * args.latency
+    print(f"{args.requests} parallel requests: {elapsed:.3f}s (serialized would be ~{serial:.3f}s)")
+    if elapsed >= serial / 2:
+        print("❌ Requests did not overlap")
+        sys.exit(1)
+    print("✅ Requests overlapped")
+
+
+if __name__ == "__main__":
+    main()
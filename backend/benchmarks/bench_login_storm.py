@@ -0,0 +1,88 @@
+"""
+Feed latency on one worker before and during a login storm.
+
+Password checks run on the hashing pool, so feed requests should keep
+their latency while bcrypt saturates the pool; logins beyond the queue
+limit get 503 instead of piling up.
+
+    python -m benchmarks.bench_login_storm --duration 5 --logins 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.cruds.user import user_crud
+from app.db import firebase
+from app.main import app
+from benchmarks.fakes import FakeAsyncClient
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+async def measure_feed(client: httpx.AsyncClient, duration: float):
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(f"{settings.API_V1_STR}/videos/feed")
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    samples.sort()
+    return samples
+
+
+def summary(samples) -> str:
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"{len(samples):>6} requests  p50 {statistics.median(samples):6.2f}ms  p99 {p99:6.2f}ms"
+
+
+async def run(duration: float, logins: int):
+    fake = FakeAsyncClient()
+    for i in range(20):
+        await fake.collection("videos").document(f"video-{i}").set({
+            "title": f"Video {i}", "description": "", "thumbnailUrl": "", "videoUrl": "",
+            "category": "Action", "duration": "1h",
+        })
+    firebase.db = fake
+    await user_crud.create_user({"email": EMAIL, "password": PASSWORD, "display_name": "Storm"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"idle:  {summary(await measure_feed(client, duration))}")
+
+        statuses = []
+        stop = asyncio.Event()
+
+        async def login_loop():
+            while not stop.is_set():
+                response = await client.post(
+                    f"{settings.API_V1_STR}/auth/login", data={"username": EMAIL, "password": PASSWORD}
+                )
+                statuses.append(response.status_code)
+                if response.status_code == 503:
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+        storm = [asyncio.create_task(login_loop()) for _ in range(logins)]
+        await asyncio.sleep(0.1)
+        samples = await measure_feed(client, duration)
+        stop.set()
+        await asyncio.gather(*storm)
+        print(f"storm: {summary(samples)}")
+        print(f"logins: {statuses.count(200)} ok, {statuses.count(503)} shed with 503")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--logins", type=int, default=64, help="concurrent login clients")
+    args = parser.parse_args()
+    asyncio.run(run(args.duration, args.logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Query latency of the in-process search index on a synthetic catalog.
+
+Words follow a Zipf distribution over a generated vocabulary, like real
+titles and synopses. Each query shape is run once untimed first, because
+the first query touching a long posting list after it changes pays to
+rank it; steady-state latency is what is reported.
+
+    python -m benchmarks.bench_search --videos 100000 --queries 2000
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+from app.services.search import SearchIndex
+
+SYLLABLES = "ka lo mi ra ne to shi va dor el an tur bel qu zen fi ro sa mo ly dra kin".split()
+CATEGORIES = ["Action", "Drama", "Sci-Fi", "Comedy", "Horror", "Documentary", "Thriller", "Romance", "Animation"]
+
+
+def build_vocabulary(size: int):
+    words = ["".join(parts) for n in (2, 3) for parts in itertools.product(SYLLABLES, repeat=n)]
+    words = words[:size]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, list(itertools.accumulate(weights))
+
+
+def synthetic_video(rng: random.Random, vocabulary, i: int) -> dict:
+    words, cum_weights = vocabulary
+    draw = lambda k: rng.choices(words, cum_weights=cum_weights, k=k)
+    return {
+        "id": f"video-{i}",
+        "title": " ".join(draw(rng.randint(1, 4))).title(),
+        "description": " ".join(draw(rng.randint(12, 30))),
+        "category": rng.choice(CATEGORIES),
+    }
+
+
+def percentile(samples, pct: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--vocabulary", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(args.vocabulary)
+    words = vocabulary[0]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(args.videos):
+        index.add(synthetic_video(rng, vocabulary, i))
+    print(f"indexed {args.videos:,} videos in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    data = index.dump()
+    dumped = time.perf_counter() - start
+    start = time.perf_counter()
+    SearchIndex().restore(SearchIndex.parse(data))
+    print(f"snapshot {len(data) / 1e6:.1f} MB: dump {dumped:.2f}s, load {time.perf_counter() - start:.2f}s")
+
+    query_word = lambda: rng.choice(words[:2000])
+    kinds = {
+        "word": query_word,
+        "two words": lambda: f"{query_word()} {query_word()}",
+        "typeahead": lambda: query_word()[:rng.randint(3, 5)],
+        "typo": lambda: query_word()[:-1] + "x",
+    }
+    for kind, make_query in kinds.items():
+        queries = [make_query() for _ in range(args.queries)]
+        for query in queries:
+            index.search(query, limit=10)
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, limit=10)
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        print(
+            f"{kind:>10}: p50 {statistics.median(samples):7.0f}µs  "
+            f"p95 {percentile(samples, 95):7.0f}µs  p99 {percentile(samples, 99):7.0f}µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+CPU per cached feed request: the old JSON/Pydantic round trip versus
+pre-encoded response bytes.
+
+    old hit:   json.loads(redis value) -> validate List[Video] -> dump -> json.dumps
+    new hit:   L1 returns the stored bytes
+    new redis: decode the binary cache envelope (no JSON parsing)
+    miss:      old json.dumps of validated dicts vs one pydantic-core validate + dump_json
+
+    python -m benchmarks.bench_serialization --videos 20 --iterations 20000
+"""
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from app.api.responses import encode
+from app.db.cache import CacheEntry, _decode_entry, _encode_entry
+from app.models.schemas.video import Video
+
+
+def sample_videos(count: int):
+    return [
+        {
+            "id": f"video-{i}",
+            "title": f"Interstellar Journey {i}",
+            "description": "A crew of astronauts travel through a wormhole in space in an attempt to ensure humanity's survival.",
+            "thumbnailUrl": "https://images.unsplash.com/photo-1446776811953-b23d57bd21aa?auto=format&fit=crop&q=80&w=1000",
+            "videoUrl": "https://test-streams.mux.dev/x36xhzz/x36xhzz.m3u8",
+            "category": "Sci-Fi",
+            "duration": "2h 49m",
+            "trending": i % 3 == 0,
+            "views": 1500 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def per_call_us(func, iterations: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    adapter = TypeAdapter(list[Video])
+    videos = sample_videos(args.videos)
+
+    redis_json = json.dumps(videos)
+    body = encode(adapter, videos)
+    redis_envelope = _encode_entry(CacheEntry(body, time.time() + 300))
+
+    def old_hit():
+        data = json.loads(redis_json)
+        return json.dumps(adapter.dump_python(adapter.validate_python(data), mode="json")).encode()
+
+    def new_l1_hit():
+        return body
+
+    def new_redis_hit():
+        return _decode_entry(redis_envelope).value
+
+    def old_miss():
+        return json.dumps(adapter.dump_python(adapter.validate_python(videos), mode="json")).encode()
+
+    def new_miss():
+        return encode(adapter, videos)
+
+    old = per_call_us(old_hit, args.iterations)
+    print(f"hit,  old round trip:     {old:8.1f}µs")
+    for name, func in (("hit,  new L1 bytes:", new_l1_hit), ("hit,  new Redis bytes:", new_redis_hit)):
+        took = per_call_us(func, args.iterations)
+        print(f"{name:<25}{took:8.1f}µs  ({old / max(took, 1e-3):,.0f}x less CPU)")
+    old = per_call_us(old_miss, args.iterations)
+    new = per_call_us(new_miss, args.iterations)
+    print(f"miss, old json.dumps:     {old:8.1f}µs")
+    print(f"miss, new dump_json:      {new:8.1f}µs  ({old / new:.1f}x less CPU)")
+
+
+if __name__ == "__main__":
+    main()
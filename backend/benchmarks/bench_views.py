@@ -0,0 +1,74 @@
+"""
+Sustained views/sec on one worker: a Firestore write per view versus the
+write-behind ViewCounter.
+
+    python -m benchmarks.bench_views --duration 5 --concurrency 200 --latency 0.02
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.cruds.video import video_crud
+from app.db import firebase
+from app.services.view_counter import ViewCounter
+from benchmarks.fakes import FakeAsyncClient
+
+
+async def drive(record, duration: float, concurrency: int, video_ids) -> int:
+    deadline = time.perf_counter() + duration
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            await record(random.choice(video_ids))
+            done += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+async def run(duration: float, concurrency: int, latency: float, videos: int, flush_interval: float):
+    fake = FakeAsyncClient()
+    video_ids = [f"video-{i}" for i in range(videos)]
+    for video_id in video_ids:
+        await fake.collection("videos").document(video_id).set({"views": 0})
+    fake.latency = latency
+    firebase.db = fake
+
+    before = await drive(video_crud.update_views, duration, concurrency, video_ids)
+    print(f"before: {before / duration:>12,.0f} views/s  ({fake.calls} Firestore calls)")
+
+    fake.calls = 0
+    counter = ViewCounter(backend="memory")
+
+    async def flusher():
+        while True:
+            await asyncio.sleep(flush_interval)
+            await counter.flush()
+
+    flush_task = asyncio.create_task(flusher())
+    after = await drive(counter.record, duration, concurrency, video_ids)
+    flush_task.cancel()
+    await counter.flush()
+    print(f"after:  {after / duration:>12,.0f} views/s  ({fake.calls} Firestore calls)")
+
+    stored = sum(fake._docs[("videos", video_id)]["views"] for video_id in video_ids)
+    assert stored == before + after, f"lost views: stored {stored}, expected {before + after}"
+    print(f"speedup: {after / max(before, 1):.1f}x, all {stored:,} views persisted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.duration, args.concurrency, args.latency, args.videos, args.flush_interval))
+
+
+if __name__ == "__main__":
+    main()
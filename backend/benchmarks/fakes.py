@@ -0,0 +1,263 @@
+"""
+In-memory stand-in for the Firestore ``AsyncClient``.
+
+Implements the subset of the async API the cruds use, with an optional
+per-call latency so benchmarks can tell overlapping requests apart from
+serialized ones.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud import firestore
+
+
+def _resolve(current: Optional[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(current or {})
+    for key, value in data.items():
+        if value is firestore.SERVER_TIMESTAMP:
+            result[key] = datetime.now(timezone.utc)
+        elif value is firestore.DELETE_FIELD:
+            result.pop(key, None)
+        elif isinstance(value, firestore.Increment):
+            result[key] = result.get(key, 0) + value.value
+        else:
+            result[key] = value
+    return result
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeAsyncClient", path: Tuple[str, ...]):
+        self._client = client
+        self._path = path
+        self.id = path[-1]
+
+    @property
+    def path(self) -> str:
+        return "/".join(self._path)
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, self._path + (name,))
+
+    async def get(self, *args, **kwargs) -> FakeSnapshot:
+        await self._client._tick()
+        return self._client._snapshot(self._path)
+
+    async def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        await self._client._tick()
+        self._client._write(self._path, data, merge=merge)
+
+    async def create(self, data: Dict[str, Any]) -> None:
+        await self._client._tick()
+        if self._path in self._client._docs:
+            raise AlreadyExists(f"Document already exists: {self.path}")
+        self._client._write(self._path, data)
+
+    async def update(self, data: Dict[str, Any]) -> None:
+        await self._client._tick()
+        if self._path not in self._client._docs:
+            raise NotFound(f"No document to update: {self.path}")
+        self._client._write(self._path, data, merge=True)
+
+    async def delete(self) -> None:
+        await self._client._tick()
+        self._client._docs.pop(self._path, None)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeAsyncClient", path: Tuple[str, ...]):
+        self._client = client
+        self._path = path
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._orders: List[Tuple[str, str]] = []
+        self._limit: Optional[int] = None
+        self._start_after: Optional[Dict[str, Any]] = None
+
+    def _clone(self) -> "FakeQuery":
+        query = FakeQuery(self._client, self._path)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._start_after = self._start_after
+        return query
+
+    def where(self, *args, filter=None) -> "FakeQuery":
+        query = self._clone()
+        if filter is not None:
+            query._filters.append((filter.field_path, filter.op_string, filter.value))
+        else:
+            query._filters.append(tuple(args))
+        return query
+
+    def order_by(self, field: str, direction: str = firestore.Query.ASCENDING) -> "FakeQuery":
+        query = self._clone()
+        query._orders.append((field, direction))
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        query = self._clone()
+        query._limit = count
+        return query
+
+    def start_after(self, values: Any) -> "FakeQuery":
+        query = self._clone()
+        if isinstance(values, FakeSnapshot):
+            values = {**(values.to_dict() or {}), "__name__": values.id}
+        query._start_after = values
+        return query
+
+    @staticmethod
+    def _matches(data: Dict[str, Any], field: str, op: str, value: Any) -> bool:
+        if field not in data:
+            return False
+        current = data[field]
+        if op == "==":
+            return current == value
+        if op == "in":
+            return current in value
+        if op == "array_contains":
+            return value in (current or [])
+        if op == ">=":
+            return current >= value
+        if op == "<=":
+            return current <= value
+        if op == ">":
+            return current > value
+        if op == "<":
+            return current < value
+        raise ValueError(f"Unsupported operator: {op}")
+
+    def _sort_key(self, doc_id: str, data: Dict[str, Any]) -> Tuple:
+        return tuple(doc_id if field == "__name__" else data.get(field) for field, _ in self._orders)
+
+    def _is_after(self, key: Tuple, cursor: Tuple) -> bool:
+        for (_, direction), value, bound in zip(self._orders, key, cursor):
+            if value != bound:
+                return value < bound if direction == firestore.Query.DESCENDING else value > bound
+        return False
+
+    def _results(self) -> List[Tuple[str, Dict[str, Any]]]:
+        depth = len(self._path) + 1
+        rows = [
+            (path[-1], data)
+            for path, data in self._client._docs.items()
+            if len(path) == depth and path[:-1] == self._path
+        ]
+        for field, op, value in self._filters:
+            rows = [row for row in rows if self._matches(row[1], field, op, value)]
+        for field, _ in self._orders:
+            if field != "__name__":
+                rows = [row for row in rows if field in row[1]]
+
+        rows.sort(key=lambda row: row[0])
+        for field, direction in reversed(self._orders):
+            rows.sort(
+                key=lambda row: row[0] if field == "__name__" else row[1][field],
+                reverse=direction == firestore.Query.DESCENDING,
+            )
+
+        if self._start_after is not None:
+            cursor = tuple(self._start_after.get(field) for field, _ in self._orders)
+            rows = [row for row in rows if self._is_after(self._sort_key(*row), cursor)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    async def stream(self, *args, **kwargs):
+        await self._client._tick()
+        for doc_id, data in self._results():
+            yield FakeSnapshot(FakeDocumentReference(self._client, self._path + (doc_id,)), data)
+
+    async def get(self, *args, **kwargs) -> List[FakeSnapshot]:
+        return [doc async for doc in self.stream()]
+
+
+class FakeCollectionReference(FakeQuery):
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._path + (document_id or uuid.uuid4().hex[:20],))
+
+    async def add(self, data: Dict[str, Any]) -> Tuple[datetime, FakeDocumentReference]:
+        doc_ref = self.document()
+        await doc_ref.set(data)
+        return datetime.now(timezone.utc), doc_ref
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeAsyncClient"):
+        self._client = client
+        self._ops: List[Tuple[str, FakeDocumentReference, Dict[str, Any], bool]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(("set", reference, data, merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._ops.append(("update", reference, data, True))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._ops.append(("delete", reference, {}, False))
+
+    async def commit(self) -> None:
+        await self._client._tick()
+        for op, reference, _, _ in self._ops:
+            if op == "update" and reference._path not in self._client._docs:
+                raise NotFound(f"No document to update: {reference.path}")
+        for op, reference, data, merge in self._ops:
+            if op == "delete":
+                self._client._docs.pop(reference._path, None)
+            else:
+                self._client._write(reference._path, data, merge=merge)
+        self._ops = []
+
+
+class FakeAsyncClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._docs: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+    async def _tick(self) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _snapshot(self, path: Tuple[str, ...]) -> FakeSnapshot:
+        data = self._docs.get(path)
+        return FakeSnapshot(FakeDocumentReference(self, path), dict(data) if data is not None else None)
+
+    def _write(self, path: Tuple[str, ...], data: Dict[str, Any], merge: bool = False) -> None:
+        current = self._docs.get(path) if merge else None
+        self._docs[path] = _resolve(current, data)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, (name,))
+
+    async def get_all(self, references: List[FakeDocumentReference], *args, **kwargs):
+        await self._tick()
+        for reference in references:
+            yield self._snapshot(reference._path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
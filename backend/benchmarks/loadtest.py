@@ -0,0 +1,413 @@
+"""
+Mixed-traffic load test of the whole FastAPI app on one worker.
+
+The app runs in-process over httpx's ASGI transport. Firestore is replaced by
+the in-memory fake (with an optional per-call latency) and Redis by fakeredis
+when it is installed (`pip install "fakeredis[lua]"`); without it the app runs
+with only the in-process cache, and the report says so. Trending, favorites,
+cache locks and the write-behind drains run Lua scripts, so fakeredis without
+Lua support is rejected at startup rather than measuring error paths. The catalog and users are
+synthetic and fully determined by --seed.
+
+Virtual users loop over a weighted mix of feed, video, search, login, history
+and favorites requests for --duration seconds after a --warmup. Results are
+printed per endpoint (throughput, p50/p95/p99, errors) and can be written as
+JSON and compared with an earlier run:
+
+    python -m benchmarks.loadtest --videos 20000 --users 500 --duration 30 --output run.json
+    python -m benchmarks.loadtest --baseline run.json --tolerance 0.15
+
+The process exits with status 1 when an endpoint's p95 grew or its throughput
+dropped by more than --tolerance relative to the baseline.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core import security
+from app.core.config import settings
+from app.db import cache, firebase
+from app.main import app
+from app.services import search
+from app.services.background import start_background_tasks, stop_background_tasks
+from benchmarks.bench_search import CATEGORIES, build_vocabulary, synthetic_video
+from benchmarks.fakes import FakeAsyncClient
+from seed import SAMPLE_VIDEOS
+
+try:
+    from fakeredis import aioredis as fakeredis
+except ImportError:
+    fakeredis = None
+
+PASSWORD = "correct horse battery staple"
+API = settings.API_V1_STR
+# Relative request weights; roughly a browsing session with occasional sign-ins
+DEFAULT_MIX = {
+    "feed": 30,
+    "feed_next_page": 8,
+    "video": 25,
+    "search": 12,
+    "trending": 6,
+    "history_read": 5,
+    "history_write": 5,
+    "favorites_read": 4,
+    "favorites_toggle": 3,
+    "login": 2,
+}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))]
+
+
+class Catalog:
+    """Synthetic videos and users written straight into the fake Firestore."""
+
+    def __init__(self, rng: random.Random, videos: int, users: int):
+        self.vocabulary = build_vocabulary(5000)
+        self.video_ids = [f"video-{i}" for i in range(videos)]
+        # Popularity is Zipf-like, so a few titles get most of the reads
+        self.video_weights = list(itertools.accumulate(1 / rank for rank in range(1, videos + 1)))
+        self.users: List[Tuple[str, str]] = []
+        self._rng = rng
+        self._user_count = users
+
+    async def seed(self, fake: FakeAsyncClient, bcrypt_rounds: int):
+        now = datetime.now(timezone.utc)
+        for i, video_id in enumerate(self.video_ids):
+            template = SAMPLE_VIDEOS[i % len(SAMPLE_VIDEOS)]
+            video = synthetic_video(self._rng, self.vocabulary, i)
+            video.pop("id")
+            fake._write(("videos", video_id), {
+                **video,
+                "thumbnailUrl": template["thumbnailUrl"],
+                "videoUrl": template["videoUrl"],
+                "duration": template["duration"],
+                "trending": self._rng.random() < 0.05,
+                "views": int(1_000_000 / (i + 1)) + self._rng.randint(0, 100),
+                "releasedAt": (now - timedelta(days=self._rng.randint(0, 3650))).date().isoformat(),
+                "updatedAt": now,
+            })
+
+        # Every user shares one hash; the cost of --bcrypt-rounds is what login traffic measures
+        hashed = security.pwd_context.handler("bcrypt").using(rounds=bcrypt_rounds).hash(PASSWORD)
+        for i in range(self._user_count):
+            user_id, email = f"user-{i}", f"user{i}@loadtest.example"
+            fake._write(("users", user_id), {
+                "email": email,
+                "displayName": f"Load Test {i}",
+                "hashed_password": hashed,
+                "disabled": False,
+                "createdAt": now,
+            })
+            self.users.append((user_id, email))
+
+    def pick_video(self, rng: random.Random) -> str:
+        return rng.choices(self.video_ids, cum_weights=self.video_weights)[0]
+
+    def query(self, rng: random.Random) -> str:
+        words, cum_weights = self.vocabulary
+        terms = rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 2))
+        if rng.random() < 0.3:
+            # Typeahead: the last word is still being typed
+            terms[-1] = terms[-1][:max(2, len(terms[-1]) - 2)]
+        return " ".join(terms)
+
+
+class VirtualUser:
+    """One signed-in client issuing requests back to back."""
+
+    def __init__(self, client: httpx.AsyncClient, catalog: Catalog, rng: random.Random, user: Tuple[str, str]):
+        self.client = client
+        self.catalog = catalog
+        self.rng = rng
+        self.user_id, self.email = user
+        token = security.create_access_token(self.email, user_id=self.user_id)
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.next_cursor: Optional[str] = None
+        self.feed_params: Dict[str, Any] = {}
+
+    def _category(self) -> Optional[str]:
+        return self.rng.choice(CATEGORIES) if self.rng.random() < 0.5 else None
+
+    async def feed(self) -> httpx.Response:
+        params = {"limit": 20}
+        category = self._category()
+        if category:
+            params["category"] = category
+        response = await self.client.get(f"{API}/videos/feed", params=params)
+        self.next_cursor = response.headers.get("X-Next-Cursor")
+        self.feed_params = params
+        return response
+
+    async def feed_next_page(self) -> httpx.Response:
+        if not self.next_cursor:
+            return await self.feed()
+        response = await self.client.get(
+            f"{API}/videos/feed", params={**self.feed_params, "cursor": self.next_cursor}
+        )
+        self.next_cursor = response.headers.get("X-Next-Cursor")
+        return response
+
+    async def video(self) -> httpx.Response:
+        return await self.client.get(f"{API}/videos/{self.catalog.pick_video(self.rng)}")
+
+    async def search(self) -> httpx.Response:
+        return await self.client.get(f"{API}/videos/search/query", params={"q": self.catalog.query(self.rng)})
+
+    async def trending(self) -> httpx.Response:
+        params = {"limit": 10}
+        category = self._category()
+        if category:
+            params["category"] = category
+        return await self.client.get(f"{API}/videos/trending/now", params=params)
+
+    async def history_read(self) -> httpx.Response:
+        return await self.client.get(f"{API}/user/watch-history", headers=self.headers)
+
+    async def history_write(self) -> httpx.Response:
+        return await self.client.post(
+            f"{API}/user/watch-history",
+            params={"video_id": self.catalog.pick_video(self.rng)},
+            headers=self.headers,
+        )
+
+    async def favorites_read(self) -> httpx.Response:
+        return await self.client.get(f"{API}/user/favorites", headers=self.headers)
+
+    async def favorites_toggle(self) -> httpx.Response:
+        return await self.client.post(
+            f"{API}/user/favorites/{self.catalog.pick_video(self.rng)}", headers=self.headers
+        )
+
+    async def login(self) -> httpx.Response:
+        return await self.client.post(f"{API}/auth/login", data={"username": self.email, "password": PASSWORD})
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.active = False
+
+    def record(self, name: str, elapsed_ms: float, status: int):
+        if not self.active:
+            return
+        self.latencies[name].append(elapsed_ms)
+        self.statuses[name][status] += 1
+        if status >= 400:
+            self.errors[name] += 1
+
+    def summary(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        endpoints = {}
+        everything: List[float] = []
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            everything.extend(samples)
+            endpoints[name] = self._stats(samples, self.errors[name], duration)
+            endpoints[name]["statuses"] = {str(code): n for code, n in sorted(self.statuses[name].items())}
+        everything.sort()
+        endpoints["total"] = self._stats(everything, sum(self.errors.values()), duration)
+        return endpoints
+
+    @staticmethod
+    def _stats(samples: List[float], errors: int, duration: float) -> Dict[str, Any]:
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "throughput": len(samples) / duration if duration else 0.0,
+            "p50_ms": percentile(samples, 0.50),
+            "p95_ms": percentile(samples, 0.95),
+            "p99_ms": percentile(samples, 0.99),
+        }
+
+
+async def drive(user: VirtualUser, mix: Dict[str, int], recorder: Recorder, stop: asyncio.Event):
+    names = list(mix)
+    cum_weights = list(itertools.accumulate(mix.values()))
+    actions: Dict[str, Callable] = {name: getattr(user, name) for name in names}
+    while not stop.is_set():
+        name = user.rng.choices(names, cum_weights=cum_weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await actions[name]()
+            status = response.status_code
+        except Exception as e:
+            print(f"⚠️ {name} raised {type(e).__name__}: {e}")
+            status = 599
+        recorder.record(name, (time.perf_counter() - start) * 1000, status)
+        if status == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+
+async def _check_lua(client):
+    try:
+        await client.eval("return 1", 0)
+    except Exception as e:
+        sys.exit(f"❌ fakeredis can't run Lua scripts ({e}); install it with `pip install \"fakeredis[lua]\"` or pass --no-redis")
+
+
+async def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    fake = FakeAsyncClient(latency=args.firestore_latency / 1000)
+    catalog = Catalog(rng, args.videos, args.users)
+    started = time.perf_counter()
+    await catalog.seed(fake, args.bcrypt_rounds)
+    firebase.db = fake
+    print(f"🌱 Seeded {args.videos} videos and {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    settings.SEARCH_INDEX_SNAPSHOT_PATH = ""
+    if fakeredis and not args.no_redis:
+        cache.redis_client = fakeredis.FakeRedis()
+        await _check_lua(cache.redis_client)
+    else:
+        cache.redis_client = None
+    await search.sync_search_index()
+    start_background_tasks()
+
+    recorder = Recorder()
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", limits=limits) as client:
+            users = [
+                VirtualUser(client, catalog, random.Random(args.seed * 1_000_003 + i), catalog.users[i % len(catalog.users)])
+                for i in range(args.concurrency)
+            ]
+            tasks = [asyncio.create_task(drive(user, args.mix, recorder, stop)) for user in users]
+            await asyncio.sleep(args.warmup)
+            recorder.active = True
+            measured_from = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            recorder.active = False
+            measured = time.perf_counter() - measured_from
+            stop.set()
+            await asyncio.gather(*tasks)
+    finally:
+        await stop_background_tasks()
+        await cache.close_redis()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "redis": "fakeredis" if fakeredis and not args.no_redis else "disabled",
+            "videos": args.videos,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration": measured,
+            "warmup": args.warmup,
+            "firestore_latency_ms": args.firestore_latency,
+            "firestore_calls": fake.calls,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "seed": args.seed,
+            "mix": args.mix,
+        },
+        "endpoints": recorder.summary(measured),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def print_report(results: Dict[str, Any]):
+    meta = results["meta"]
+    print(
+        f"\n{meta['concurrency']} users for {meta['duration']:.1f}s, redis={meta['redis']}, "
+        f"firestore latency {meta['firestore_latency_ms']}ms, {meta['firestore_calls']} firestore calls"
+    )
+    print(f"{'endpoint':<18}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, stats in results["endpoints"].items():
+        print(
+            f"{name:<18}{stats['requests']:>10}{stats['throughput']:>10.1f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+        )
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change per endpoint against a baseline run and return the regressions."""
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('commit') or ''} ({baseline['meta'].get('timestamp', '?')})")
+    print(f"{'endpoint':<18}{'req/s':>12}{'p95':>12}{'p99':>12}")
+    for name, stats in results["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before or not before["requests"]:
+            continue
+        change = lambda key: (stats[key] - before[key]) / before[key] if before[key] else 0.0
+        print(f"{name:<18}{change('throughput'):>+12.1%}{change('p95_ms'):>+12.1%}{change('p99_ms'):>+12.1%}")
+        if change("p95_ms") > tolerance:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {stats['p95_ms']:.2f}ms")
+        if change("throughput") < -tolerance:
+            regressions.append(f"{name}: throughput {before['throughput']:.1f} -> {stats['throughput']:.1f} req/s")
+    return regressions
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """`feed=30,video=25` overrides the weights of the named scenarios; weight 0 disables one."""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before measuring")
+    parser.add_argument("--firestore-latency", type=float, default=2.0, help="ms added to every fake Firestore call")
+    parser.add_argument("--bcrypt-rounds", type=int, default=settings.PASSWORD_BCRYPT_ROUNDS)
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="e.g. login=0,search=40")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-redis", action="store_true", help="run without fakeredis even if it is installed")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions beyond tolerance:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
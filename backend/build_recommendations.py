@@ -0,0 +1,123 @@
+"""
+Build the item-item recommendation artifact from watch history and favorites.
+
+    python build_recommendations.py --k 50
+
+Every history and favorites document becomes a weighted (user, video)
+interaction in a sparse user x video matrix. Columns are L2-normalized, and
+video-video cosine similarities are computed one block of rows at a time,
+keeping only the top K neighbors of each video, so memory stays bounded by
+the block size rather than the square of the catalog. The result is written
+to RECOMMENDATIONS_PATH, which API workers pick up without a restart.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from array import array
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy import sparse
+from app.core.config import settings
+from app.db.firebase import get_db, initialize_firebase
+from app.services.recommendations import save_artifact
+
+# Subcollection of users/{id} -> interaction weight; document ids are video ids
+INTERACTION_WEIGHTS = {"history": 1.0, "favorites": 3.0}
+KEEP_ARTIFACTS = 2
+
+
+async def export_interactions(db) -> Tuple[List[str], List[str], sparse.csr_matrix]:
+    users: Dict[str, int] = {}
+    items: Dict[str, int] = {}
+    rows, cols, weights = array("i"), array("i"), array("f")
+    for collection, weight in INTERACTION_WEIGHTS.items():
+        count = 0
+        # A collection group query reads every user's subcollection in one stream
+        async for doc in db.collection_group(collection).stream():
+            user_id = doc.reference.parent.parent.id
+            rows.append(users.setdefault(user_id, len(users)))
+            cols.append(items.setdefault(doc.id, len(items)))
+            weights.append(weight)
+            count += 1
+        print(f"📥 {count} {collection} interactions")
+
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(weights, dtype=np.float32), (np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32))),
+        shape=(len(users), len(items)),
+    )
+    # Watched and favorited adds up; repeated rows of the same kind do too
+    matrix.sum_duplicates()
+    return list(users), list(items), matrix
+
+
+def top_k_similarities(matrix: sparse.csr_matrix, k: int, block_size: int, min_score: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k cosine neighbors per column, computed block_size columns at a time."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsr()
+    by_item = normalized.T.tocsr()
+
+    n_items = matrix.shape[1]
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    started = time.perf_counter()
+    for start in range(0, n_items, block_size):
+        block = (by_item[start:start + block_size] @ normalized).tocsr()
+        for offset in range(block.shape[0]):
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            candidates, similarity = block.indices[lo:hi], block.data[lo:hi]
+            keep = (candidates != start + offset) & (similarity >= min_score)
+            candidates, similarity = candidates[keep], similarity[keep]
+            if len(similarity) > k:
+                top = np.argpartition(-similarity, k - 1)[:k]
+                candidates, similarity = candidates[top], similarity[top]
+            order = np.argsort(-similarity)
+            neighbors[start + offset, :len(order)] = candidates[order]
+            scores[start + offset, :len(order)] = similarity[order]
+        done = min(start + block_size, n_items)
+        print(f"🧮 {done}/{n_items} videos ({done / (time.perf_counter() - started):.0f}/s)")
+    return neighbors, scores
+
+
+def prune_old_artifacts(path: str):
+    base = os.path.abspath(path)
+    current = os.path.realpath(base)
+    parent, prefix = os.path.dirname(base), os.path.basename(base) + "-"
+    builds = sorted(name for name in os.listdir(parent) if name.startswith(prefix))
+    for name in builds[:-KEEP_ARTIFACTS]:
+        if os.path.join(parent, name) != current:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+async def main(args):
+    initialize_firebase()
+    db = get_db()
+    if db is None:
+        print("❌ Error: Firebase not initialized. Check your credentials.")
+        return
+
+    started = time.perf_counter()
+    user_ids, item_ids, matrix = await export_interactions(db)
+    if not item_ids:
+        print("ℹ️ No interactions yet, nothing to build")
+        return
+    print(f"📊 {len(user_ids)} users x {len(item_ids)} videos, {matrix.nnz} interactions")
+
+    neighbors, scores = top_k_similarities(matrix, args.k, args.block_size, args.min_score)
+    directory = save_artifact(
+        args.output, item_ids, neighbors, scores,
+        {"k": args.k, "users": len(user_ids), "interactions": int(matrix.nnz)},
+    )
+    prune_old_artifacts(args.output)
+    print(f"✨ Wrote {directory} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=50, help="neighbors kept per video")
+    parser.add_argument("--block-size", type=int, default=1024, help="videos per similarity block")
+    parser.add_argument("--min-score", type=float, default=0.01, help="drop weaker similarities")
+    parser.add_argument("--output", default=settings.RECOMMENDATIONS_PATH)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,235 @@
+"""
+Bulk import videos from an NDJSON or CSV file.
+
+    python import_catalog.py catalog.ndjson
+    python import_catalog.py catalog.csv --concurrency 8 --checkpoint catalog.ckpt
+
+Rows are streamed, validated with VideoCreate and upserted by id in batched
+commits of up to 500 writes, several batches in flight at once. Rows without
+an id get one derived from their videoUrl, so re-running an import never
+duplicates videos. Progress is checkpointed after every committed stretch of
+rows; an interrupted run started again with the same checkpoint resumes
+where it stopped. When the import finishes, the catalog cache version is
+bumped, which retires every cached feed, trending and home list at once,
+and the search index snapshot is brought up to date.
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from pydantic import ValidationError
+from app.core.config import settings
+from app.cruds.video import CATALOG_NAMESPACE, WRITE_BATCH_SIZE, video_crud
+from app.db.cache import cache_bump_versions, close_redis, init_redis
+from app.db.firebase import get_db, initialize_firebase
+from app.models.schemas.video import VideoCreate
+from app.services import search
+
+MAX_ATTEMPTS = 5
+
+
+Row = Union[str, Dict[str, Any]]
+
+
+def read_rows(path: str, fmt: str) -> Iterator[Tuple[int, Row]]:
+    """Yield (row number, CSV row dict or raw JSON line) one at a time, without reading the whole file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                yield number, {key: value for key, value in row.items() if value not in (None, "")}
+        else:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield number, line
+
+
+def parse_row(row: Row) -> VideoCreate:
+    # JSON lines are parsed and validated in one pass by pydantic-core
+    return VideoCreate.model_validate_json(row) if isinstance(row, str) else VideoCreate.model_validate(row)
+
+
+def video_id_for(video: VideoCreate) -> str:
+    return video.id or hashlib.sha1(video.videoUrl.encode()).hexdigest()[:20]
+
+
+class Checkpoint:
+    """Number of leading input rows that are known to be committed."""
+
+    def __init__(self, path: Optional[str], source: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.rows = 0
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get("source") != self.source:
+            raise SystemExit(f"❌ Checkpoint {self.path} belongs to {state.get('source')}, not {self.source}")
+        self.rows = state["rows"]
+
+    def save(self, rows: int):
+        self.rows = rows
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source": self.source, "rows": rows, "savedAt": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+    def __init__(self, checkpoint: Checkpoint, concurrency: int, batch_size: int, max_errors: int):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.slots = asyncio.Semaphore(concurrency)
+        self.tasks: Set[asyncio.Task] = set()
+        self.failure: Optional[BaseException] = None
+        # Batches finish out of order; the checkpoint only moves past contiguous ones
+        self.pending: List[int] = []
+        self.finished: Dict[int, int] = {}
+        self.written = 0
+        self.invalid = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    async def _commit(self, videos: List[Dict[str, Any]]):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                await video_crud.upsert_many(videos)
+                return
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                delay = min(30, 0.5 * 2 ** attempt)
+                print(f"⚠️ Batch commit failed ({e}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+    async def _run_batch(self, last_row: int, videos: List[Dict[str, Any]]):
+        try:
+            await self._commit(videos)
+        except Exception as e:
+            self.failure = self.failure or e
+            return
+        finally:
+            self.slots.release()
+        self.written += len(videos)
+        self.batches += 1
+        self.finished[last_row] = len(videos)
+        committed = None
+        while self.pending and self.pending[0] in self.finished:
+            committed = self.pending.pop(0)
+            del self.finished[committed]
+        if committed is not None:
+            self.checkpoint.save(committed)
+
+    async def _submit(self, last_row: int, videos: List[Dict[str, Any]]):
+        await self.slots.acquire()
+        self.pending.append(last_row)
+        task = asyncio.create_task(self._run_batch(last_row, videos))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.written / elapsed if elapsed else 0.0
+        print(f"📦 {self.written} videos in {self.batches} batches, {self.invalid} invalid, {rate:.0f} videos/s")
+
+    async def run(self, rows: Iterator[Tuple[int, Row]]):
+        batch: List[Dict[str, Any]] = []
+        batch_ids: Set[str] = set()
+        resume_after = last_row = self.checkpoint.rows
+        for number, row in rows:
+            if number <= resume_after:
+                continue
+            if self.failure:
+                break
+            last_row = number
+            try:
+                video = parse_row(row)
+            except ValidationError as e:
+                self.invalid += 1
+                print(f"⚠️ Row {number} skipped: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+                if self.max_errors >= 0 and self.invalid > self.max_errors:
+                    self.failure = RuntimeError(f"more than {self.max_errors} invalid rows")
+                    break
+                continue
+
+            video_id = video_id_for(video)
+            if video_id in batch_ids:
+                # Two writes to one document can't share a batch; the later row wins
+                batch = [item for item in batch if item["id"] != video_id]
+            batch.append({**video.model_dump(exclude={"id"}), "id": video_id})
+            batch_ids.add(video_id)
+            if len(batch) >= self.batch_size:
+                await self._submit(number, batch)
+                batch, batch_ids = [], set()
+                if self.batches and self.batches % 20 == 0:
+                    self._progress()
+
+        if batch and not self.failure:
+            await self._submit(last_row, batch)
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+        self._progress()
+
+
+async def main(args) -> int:
+    initialize_firebase()
+    if get_db() is None:
+        print("❌ Error: Firebase not initialized. Check your credentials.")
+        return 1
+    await init_redis()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    checkpoint = Checkpoint(args.checkpoint or f"{args.path}.checkpoint", args.path)
+    if args.restart:
+        checkpoint.clear()
+    checkpoint.load()
+    if checkpoint.rows:
+        print(f"↩️ Resuming after row {checkpoint.rows}")
+
+    importer = Importer(checkpoint, args.concurrency, args.batch_size, args.max_errors)
+    try:
+        await importer.run(read_rows(args.path, fmt))
+        if importer.failure:
+            print(f"❌ Import stopped: {importer.failure}. Run again to resume after row {checkpoint.rows}.")
+            return 1
+
+        # Videos may have moved between categories, which per-batch bumps can't see
+        await cache_bump_versions(CATALOG_NAMESPACE)
+        print("🧹 Retired cached catalog lists")
+        if settings.SEARCH_INDEX_ENABLED and not args.skip_search_index:
+            started = time.perf_counter()
+            await (await search.start_search_index())
+            print(f"🔎 Search index synced ({len(search.search_index)} videos) in {time.perf_counter() - started:.1f}s")
+        checkpoint.clear()
+        elapsed = time.perf_counter() - importer.started
+        print(f"✨ Imported {importer.written} videos in {elapsed:.1f}s ({importer.written / elapsed:.0f}/s), {importer.invalid} invalid rows")
+        return 0
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="NDJSON (one video per line) or CSV with a header row")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE, choices=range(1, WRITE_BATCH_SIZE + 1), metavar=f"1-{WRITE_BATCH_SIZE}")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches committed in parallel")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--max-errors", type=int, default=-1, help="abort after this many invalid rows (-1: never)")
+    parser.add_argument("--skip-search-index", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
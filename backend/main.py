@@ -1,12 +1,61 @@
+"""
+Run the API.
+
+    python main.py                  # ENVIRONMENT=development: one process, auto-reload
+    python main.py --workers 4      # worker processes, uvloop + httptools (never reloads)
+    ENVIRONMENT=production python main.py   # WEB_CONCURRENCY workers, no reload
+
+Without reload, SIGTERM stops accepting connections, lets in-flight
+requests finish for up to SERVER_GRACEFUL_TIMEOUT seconds, then runs the
+app's shutdown, which flushes buffered views and playback positions.
+Workers report ready on /ready once warmed up; /health only says the
+process is alive.
+"""
+import argparse
+import importlib.util
 import uvicorn
-import os
+from app.core.config import settings
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="worker processes (default: WEB_CONCURRENCY)")
+    parser.add_argument(
+        "--reload",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="restart on code changes (single process; default in development unless --workers > 1)",
+    )
+    args = parser.parse_args()
+    if args.reload is None:
+        args.reload = settings.ENVIRONMENT == "development" and args.workers <= 1
+    elif args.reload and args.workers > 1:
+        parser.error("--reload runs a single process; drop it or use --workers 1")
+
+    if args.reload:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True, log_level="info")
+        return
 
-if __name__ == "__main__":
-    # Point uvicorn to the new app structure
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_TIMEOUT,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+        log_level=settings.LOG_LEVEL.lower(),
     )
+
+
+if __name__ == "__main__":
+    main()
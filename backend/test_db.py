@@ -12,14 +12,14 @@ async def test_db():
     try:
         # Try to write a test record
         test_ref = db.collection('test_connection').document('ping')
-        test_ref.set({
+        await test_ref.set({
             'timestamp': firestore.SERVER_TIMESTAMP,
             'status': 'ok'
         })
         print("✅ Successfully wrote to Firestore.")
 
         # Try to read it back
-        doc = test_ref.get()
+        doc = await test_ref.get()
         if doc.exists:
             print(f"✅ Successfully read from Firestore: {doc.to_dict()}")
         else: